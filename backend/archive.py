@@ -0,0 +1,97 @@
+"""Архивация давно закрытых задач.
+
+Задачи, закрытые больше ARCHIVE_AFTER_DAYS дней назад, переносятся из tasks в tasks_archive
+пачками по ARCHIVE_BATCH_SIZE (пачка - одна транзакция, см. task_repository.archive_closed).
+Горячая таблица, которую читают список, статистика и обработчики webhook, и ее индексы
+остаются небольшими.
+
+Баллы остаются в журнале points_ledger, поэтому лидеры (user_points) от переноса не меняются;
+счетчики по статусам учитывают архив (см. stats.py).
+GET /tasks/{id} ищет задачу и в архиве, список отдает архивные задачи с include_archived=true.
+Архивные задачи только читаются и удаляются; полнотекстовый поиск их не находит.
+
+В приложении перенос выполняет фоновая задача раз в ARCHIVE_INTERVAL секунд (0 - выключено).
+Запуск вручную (из backend/):
+    python archive.py              # перенести задачи старше ARCHIVE_AFTER_DAYS дней
+    python archive.py --days 90
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import timedelta
+
+import task_repository
+from database import init_db, close_db
+from metrics import Counter, register
+
+logger = logging.getLogger("archive")
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+tasks_archived = register(Counter("tasks_archived_total", "Задачи, перенесенные в архив"))
+
+async def archive_closed_tasks(days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Переносит в архив задачи, закрытые больше days дней назад; возвращает их число"""
+    await task_repository.stamp_closed_at()
+    closed_before = task_repository.utcnow() - timedelta(days=days)
+    archived = 0
+    while True:
+        task_ids = await task_repository.archive_closed(closed_before, batch_size)
+        archived += len(task_ids)
+        tasks_archived.inc(amount=len(task_ids))
+        if len(task_ids) < batch_size:
+            return archived
+        # Между пачками успевают пройти запросы и webhook, ожидающие записи
+        await asyncio.sleep(0)
+
+class ArchiveJob:
+    """Периодический перенос в архив внутри процесса приложения"""
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL, days: float = ARCHIVE_AFTER_DAYS):
+        self._interval = interval
+        self._days = days
+        self._task = None
+
+    async def start(self):
+        if self._interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                archived = await archive_closed_tasks(self._days)
+                if archived:
+                    logger.info("Перенесено в архив задач: %d", archived)
+            except Exception:
+                logger.exception("Archive job failed")
+            await asyncio.sleep(self._interval)
+
+archive_job = ArchiveJob()
+
+async def _main(argv):
+    parser = argparse.ArgumentParser(description="Перенос давно закрытых задач в архив")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS, help="сколько дней задача закрыта")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="задач в одной транзакции")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    await init_db()
+    try:
+        archived = await archive_closed_tasks(args.days, args.batch_size)
+    finally:
+        await close_db()
+    print(f"Перенесено в архив задач: {archived}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
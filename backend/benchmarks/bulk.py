@@ -0,0 +1,89 @@
+"""Бенчмарк массовых операций: строк в секунду через /tasks/bulk против поштучных запросов.
+
+Сравниваются:
+    single - N запросов POST /tasks/ и PATCH /tasks/{id}
+    json   - POST/PATCH /tasks/bulk с JSON-массивом
+    ndjson - POST/PATCH /tasks/bulk с потоковым NDJSON
+
+Запуск из backend/:
+    python benchmarks/bulk.py --items 5000
+
+База создается во временной директории, рабочая test.db не затрагивается.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def new_items(count, prefix):
+    return [
+        {"title": f"{prefix} {i}", "assignee": f"user{i % 50}", "reviewers": [f"rev{i % 7}"], "description": "bulk bench"}
+        for i in range(count)
+    ]
+
+def update_items(ids):
+    return [{"id": task_id, "status": "in_progress", "watchers": ["w1", "w2"]} for task_id in ids]
+
+def ndjson(items) -> bytes:
+    return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000, help="элементов на каждый способ")
+    parser.add_argument("--single-items", type=int, default=1000, help="элементов для поштучных запросов (медленно)")
+    args = parser.parse_args()
+
+    # DATABASE_URL относительный, поэтому переходим во временную директорию до импорта приложения
+    os.chdir(tempfile.mkdtemp(prefix="bench_bulk_"))
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    from fastapi.testclient import TestClient
+    from main import app
+
+    logging.disable(logging.INFO)
+
+    def measure(label, count, run):
+        started = time.perf_counter()
+        ids = run()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<16} {count:>8} {elapsed:>9.2f} {count / elapsed:>12.0f}")
+        return ids
+
+    with TestClient(app) as client:
+        def single_create(items):
+            return [client.post("/tasks/", json=item).json()["id"] for item in items]
+
+        def single_update(items):
+            for item in items:
+                client.patch(f"/tasks/{item['id']}", json={k: v for k, v in item.items() if k != "id"}).raise_for_status()
+
+        def bulk(method, body, headers=None):
+            response = client.request(method, "/tasks/bulk", content=body, headers=headers)
+            response.raise_for_status()
+            result = response.json()
+            assert result["failed"] == 0, result["results"][:3]
+            return [item["id"] for item in result["results"]]
+
+        json_headers = {"Content-Type": "application/json"}
+        ndjson_headers = {"Content-Type": "application/x-ndjson"}
+
+        print(f"{'mode':<16} {'rows':>8} {'seconds':>9} {'rows/sec':>12}")
+        ids = measure("single create", args.single_items, lambda: single_create(new_items(args.single_items, "single")))
+        measure("single update", len(ids), lambda: single_update(update_items(ids)))
+
+        body = json.dumps(new_items(args.items, "json")).encode()
+        ids = measure("json create", args.items, lambda: bulk("POST", body, json_headers))
+        body = json.dumps(update_items(ids)).encode()
+        measure("json update", len(ids), lambda: bulk("PATCH", body, json_headers))
+
+        body = ndjson(new_items(args.items, "ndjson"))
+        ids = measure("ndjson create", args.items, lambda: bulk("POST", body, ndjson_headers))
+        body = ndjson(update_items(ids))
+        measure("ndjson update", len(ids), lambda: bulk("PATCH", body, ndjson_headers))
+
+if __name__ == "__main__":
+    main()
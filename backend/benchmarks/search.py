@@ -0,0 +1,112 @@
+"""Бенчмарк полнотекстового поиска GET /tasks/search на синтетических задачах.
+
+Запуск из backend/:
+    python benchmarks/search.py --tasks 100000 --repeat 50
+
+База создается во временной директории, рабочая test.db не затрагивается.
+Цель: p50 типичного запроса < 10 мс на 100k задач.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYLLABLES = "ка ро ми на ло те ре ви да бо ку зе ша по ли ту де ры мо ва".split() + "ab er in on st ex de re co pro".split()
+
+def make_vocabulary(rng, size):
+    """Словарь псевдослов; частоты в текстах задач распределены по Ципфу, как в живом языке"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def make_queries(rng, vocabulary, count):
+    """Типичные запросы: 1-2 слова средней частоты, последнее иногда обрезано до префикса"""
+    queries = []
+    for _ in range(count):
+        words = [vocabulary[rng.randint(50, 3000)] for _ in range(rng.randint(1, 2))]
+        if len(words[-1]) > 5 and rng.random() < 0.5:
+            words[-1] = words[-1][:4]
+        queries.append(" ".join(words))
+    return queries
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000, help="число задач в базе")
+    parser.add_argument("--repeat", type=int, default=50, help="повторов каждого запроса")
+    parser.add_argument("--limit", type=int, default=20, help="размер выдачи")
+    parser.add_argument("--vocabulary", type=int, default=30_000, help="размер словаря")
+    parser.add_argument("--queries", type=int, default=20, help="число разных запросов")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_search_"))
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    from fastapi.testclient import TestClient
+    from database import engine
+    from main import app
+    from models import tasks
+    from search import search_tasks
+
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    cum_weights = list(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, len(vocabulary) + 1)))
+
+    def random_text(words):
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        # Наполняем через синхронный engine пачками: триггеры FTS срабатывают так же, как в приложении
+        batch_size = 10_000
+        for offset in range(0, args.tasks, batch_size):
+            rows = [
+                {
+                    "title": random_text(4),
+                    "description": random_text(30),
+                    "status": "open",
+                    "points": 0,
+                }
+                for _ in range(min(batch_size, args.tasks - offset))
+            ]
+            with engine.begin() as connection:
+                connection.execute(tasks.insert(), rows)
+        print(f"Наполнение {args.tasks} задач: {time.perf_counter() - started:.1f} с")
+
+        # Замеряем отдельно запрос к БД (search_tasks) и полный HTTP-запрос через приложение
+        print(f"{'query':<24} {'hits':>5} {'db p50':>8} {'db p99':>8} {'http p50':>9}")
+        db_timings, http_timings = [], []
+        for q in make_queries(rng, vocabulary, args.queries):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                rows = client.portal.call(search_tasks, q, args.limit)
+                timings.append((time.perf_counter() - started) * 1000)
+            http = []
+            for _ in range(max(1, args.repeat // 5)):
+                started = time.perf_counter()
+                client.get("/tasks/search", params={"q": q, "limit": args.limit}).raise_for_status()
+                http.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            db_timings.extend(timings)
+            http_timings.extend(http)
+            print(f"{q:<24} {len(rows):>5} {statistics.median(timings):>8.2f} "
+                  f"{percentile(timings, 0.99):>8.2f} {statistics.median(http):>9.2f}")
+
+        db_timings.sort()
+        http_timings.sort()
+        print(f"БД:   p50 {statistics.median(db_timings):.2f} мс, p99 {percentile(db_timings, 0.99):.2f} мс")
+        print(f"HTTP: p50 {statistics.median(http_timings):.2f} мс, p99 {percentile(http_timings, 0.99):.2f} мс")
+
+if __name__ == "__main__":
+    main()
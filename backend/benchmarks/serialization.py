@@ -0,0 +1,114 @@
+"""Бенчмарк сериализации ответа со списком задач: время на 10k задач.
+
+Сравниваются одни и те же строки из БД, отданные эндпоинтом FastAPI:
+    default - response_model=List[TaskOut]: валидация pydantic + сериализация FastAPI
+    fast    - FastJSONResponse (serialization.py) с orjson
+    stdlib  - FastJSONResponse без orjson (стандартный json)
+Запрос к БД в замер не входит: строки читаются один раз заранее. Проверяется и то,
+что все варианты отдают одинаковые байты.
+
+Запуск из backend/:
+    python benchmarks/serialization.py --tasks 10000 --repeat 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000, help="задач в ответе")
+    parser.add_argument("--repeat", type=int, default=10, help="повторов на вариант")
+    args = parser.parse_args()
+
+    # DATABASE_URL относительный, поэтому переходим во временную директорию до импорта приложения
+    os.chdir(tempfile.mkdtemp(prefix="bench_serialization_"))
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import serialization
+    from database import database, engine
+    from migrations import run_migrations
+    from models import tasks
+    from routes.tasks import TaskOut, TASK_OUT_FIELDS
+    from serialization import FastJSONResponse, rows_list
+
+    logging.disable(logging.INFO)
+
+    async def load_rows():
+        await database.connect()
+        try:
+            rows = [
+                {
+                    "title": f"Задача {i}",
+                    "description": "Описание задачи для бенчмарка сериализации " * 3,
+                    "assignee": f"user{i % 100}",
+                    "watchers": [f"user{i % 7}", f"user{i % 11}"],
+                    "reviewers": [f"user{i % 13}"],
+                    "image_urls": [f"/uploads/{i:064x}.png"],
+                    "status": "open",
+                    "points": i % 30,
+                    "branch_name": f"feature/TASK-{i}",
+                }
+                for i in range(args.tasks)
+            ]
+            for start in range(0, len(rows), 1000):
+                await database.execute(tasks.insert().values(rows[start:start + 1000]))
+            return await database.fetch_all(tasks.select().order_by(tasks.c.id))
+        finally:
+            await database.disconnect()
+
+    run_migrations(engine)
+    rows = asyncio.run(load_rows())
+
+    app = FastAPI()
+
+    @app.get("/default", response_model=List[TaskOut])
+    async def default():
+        return rows
+
+    @app.get("/fast", response_model=List[TaskOut])
+    async def fast():
+        return FastJSONResponse(rows_list(rows, TASK_OUT_FIELDS))
+
+    orjson = serialization.orjson
+    with TestClient(app) as client:
+        def measure(path):
+            timings, body = [], None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                body = client.get(path).content
+                timings.append(time.perf_counter() - started)
+            return statistics.median(timings), body
+
+        default_time, default_body = measure("/default")
+        fast_time, fast_body = measure("/fast")
+        serialization.orjson = None
+        try:
+            stdlib_time, stdlib_body = measure("/fast")
+        finally:
+            serialization.orjson = orjson
+
+    per_10k = 10000 / args.tasks
+    print(f"{'variant':<10} {'ms':>10} {'ms/10k':>10} {'speedup':>8} {'identical':>10}")
+    for label, elapsed, body in (
+        ("default", default_time, default_body),
+        ("fast" if orjson else "fast*", fast_time, fast_body),
+        ("stdlib", stdlib_time, stdlib_body),
+    ):
+        print(
+            f"{label:<10} {elapsed * 1000:>10.1f} {elapsed * 1000 * per_10k:>10.1f} "
+            f"{default_time / elapsed:>7.1f}x {str(body == default_body):>10}"
+        )
+    if orjson is None:
+        print("* orjson не установлен: fast использует стандартный json")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Микробенчмарк поиска ссылок на задачи: TaskRefMatcher против прежнего re.search.
+
+Сравниваются:
+    legacy  - re.search(r"TASK-(\\d+)") по каждому сообщению, только первая ссылка
+    matcher - task_ref_matcher: все ссылки за один проход (для push - по склеенным сообщениям)
+
+Сценарии: push с большим числом коммитов и большие описания PR.
+
+Запуск из backend/:
+    python benchmarks/task_refs.py --repeat 20
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = "the quick brown fox fixed a bug in parser closes window and resolves some text 2024 v1.2".split()
+
+def legacy_extract(text: str):
+    match = re.search(r"TASK-(\d+)", text, re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+def filler(rng, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def push_messages(rng, commits: int):
+    # Каждый пятый коммит ссылается на две задачи
+    messages = []
+    for i in range(commits):
+        refs = f"TASK-{i + 1}, TASK-{i + 1 + commits}" if i % 5 == 0 else f"TASK-{i + 1}"
+        messages.append(f"{refs}: {filler(rng, 12)}")
+    return messages
+
+def pr_body(rng, size: int, refs: int) -> str:
+    chunk = max(1, size // (6 * max(refs, 1)))
+    parts = []
+    for i in range(refs):
+        parts.append(filler(rng, chunk))
+        parts.append(f"fixes TASK-{i + 1}" if i % 2 else f"see TASK-{i + 1}")
+    parts.append(filler(rng, chunk))
+    return " ".join(parts)
+
+def measure(run, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, nargs="+", default=[10, 200, 2000], help="коммитов в push")
+    parser.add_argument("--body-kb", type=int, nargs="+", default=[4, 64, 1024], help="размер описания PR, КБ")
+    parser.add_argument("--repeat", type=int, default=20, help="повторов на сценарий")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from task_refs import task_ref_matcher
+
+    rng = random.Random(42)
+    print(f"{'scenario':<18} {'legacy, ms':>11} {'refs':>6} {'matcher, ms':>12} {'refs':>6}")
+
+    for commits in args.commits:
+        messages = push_messages(rng, commits)
+
+        def legacy():
+            return len({task_id for message in messages if (task_id := legacy_extract(message))})
+
+        def matcher():
+            return len(task_ref_matcher.find_all("\n".join(messages)))
+
+        legacy_time, legacy_found = measure(legacy, args.repeat)
+        matcher_time, matcher_found = measure(matcher, args.repeat)
+        print(f"{f'push {commits}':<18} {legacy_time * 1000:>11.3f} {legacy_found:>6} {matcher_time * 1000:>12.3f} {matcher_found:>6}")
+
+    for size_kb in args.body_kb:
+        body = pr_body(rng, size_kb * 1024, refs=max(2, size_kb // 4))
+
+        def legacy():
+            return 1 if legacy_extract(body) else 0
+
+        def matcher():
+            return len(task_ref_matcher.closing_ids(body))
+
+        legacy_time, legacy_found = measure(legacy, args.repeat)
+        matcher_time, matcher_found = measure(matcher, args.repeat)
+        print(f"{f'PR body {size_kb} KB':<18} {legacy_time * 1000:>11.3f} {legacy_found:>6} {matcher_time * 1000:>12.3f} {matcher_found:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Бенчмарк push-webhook: как задержка обработки зависит от числа коммитов в push.
+
+Замеряется время от отправки события до завершения его обработки воркером очереди.
+
+Запуск из backend/:
+    python benchmarks/webhook_push.py --tasks 1000 --repeat 20
+
+База создается во временной директории, рабочая test.db не затрагивается.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRANCH = "feature/bench"
+
+def push_payload(task_ids):
+    return {
+        "ref": f"refs/heads/{BRANCH}",
+        "commits": [{"message": f"TASK-{task_id}: bench commit"} for task_id in task_ids],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000, help="число задач в базе")
+    parser.add_argument("--commits", type=int, nargs="+", default=[1, 10, 50, 200], help="коммитов в одном push")
+    parser.add_argument("--repeat", type=int, default=20, help="повторов на каждый размер push")
+    args = parser.parse_args()
+
+    # DATABASE_URL относительный, поэтому переходим во временную директорию до импорта приложения
+    os.chdir(tempfile.mkdtemp(prefix="bench_webhook_"))
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    from contextlib import redirect_stdout
+    from fastapi.testclient import TestClient
+    from database import database
+    from github_webhook import webhook_queue
+    from main import app
+    from models import tasks
+
+    logging.disable(logging.INFO)
+
+    devnull = open(os.devnull, "w")
+    with TestClient(app) as client:
+        rows = [
+            {"title": f"bench {i}", "status": "open", "points": 0, "branch_name": BRANCH}
+            for i in range(args.tasks)
+        ]
+        client.portal.call(database.execute_many, tasks.insert(), rows)
+
+        print(f"{'commits':>8} {'p50, ms':>10} {'p95, ms':>10} {'ms/commit':>10}")
+        for commits in args.commits:
+            payload = push_payload(range(1, min(commits, args.tasks) + 1))
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                # Отладочный вывод обработчика не должен попадать в замер
+                with redirect_stdout(devnull):
+                    response = client.post("/webhook", json=payload, headers={"X-GitHub-Event": "push"})
+                    client.portal.call(webhook_queue.join)
+                timings.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{commits:>8} {p50:>10.2f} {p95:>10.2f} {p50 / commits:>10.3f}")
+
+if __name__ == "__main__":
+    main()
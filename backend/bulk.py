@@ -0,0 +1,88 @@
+"""Разбор тела массовых запросов /tasks/bulk.
+
+Тело - JSON-массив объектов или NDJSON (Content-Type: application/x-ndjson, по объекту
+на строку). NDJSON читается потоково: элементы отдаются пачками по мере поступления
+данных, и большой импорт не держит в памяти весь запрос.
+Ошибка разбора или валидации отдельного элемента не прерывает обработку остальных.
+"""
+import json
+import os
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+# Размер пачки = размер одной транзакции
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "100000"))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}" for error in exc.errors()
+    )
+
+def decode_line(line: bytes):
+    """(значение, None) или (None, текст ошибки) для строки NDJSON"""
+    try:
+        return json.loads(line), None
+    except json.JSONDecodeError as exc:
+        return None, f"Некорректный JSON: {exc.msg}"
+    except UnicodeDecodeError:
+        return None, "Некорректный JSON: строка не в UTF-8"
+
+def parse_item(model, raw):
+    """(модель, None) или (None, текст ошибки); raw - уже разобранный JSON"""
+    # Элемент-строка не разбирается как JSON второй раз: "{\"title\": ...}" - ошибка, а не задача
+    if not isinstance(raw, dict):
+        return None, "Элемент должен быть JSON-объектом"
+    try:
+        return model.model_validate(raw), None
+    except ValidationError as exc:
+        return None, validation_message(exc)
+
+async def ndjson_lines(request: Request):
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    yield buffer
+
+async def raw_items(request: Request):
+    """Пары (разобранный элемент, ошибка разбора или None) в порядке тела запроса"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        async for line in ndjson_lines(request):
+            if line.strip():
+                yield decode_line(line)
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Некорректный JSON: {exc.msg}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив или NDJSON")
+    for item in items:
+        yield item, None
+
+async def bulk_chunks(request: Request, model: BaseModel):
+    """Пачки [(индекс, модель или None, ошибка или None)] не длиннее BULK_CHUNK_SIZE"""
+    chunk, index = [], 0
+    async for raw, error in raw_items(request):
+        if index >= BULK_MAX_ITEMS:
+            # Уже обработанные пачки зафиксированы; остаток запроса не читаем
+            chunk.append((index, None, f"Превышен лимит {BULK_MAX_ITEMS} элементов, остаток запроса не обработан"))
+            break
+        item = None
+        if error is None:
+            item, error = parse_item(model, raw)
+        chunk.append((index, item, error))
+        index += 1
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
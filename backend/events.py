@@ -0,0 +1,119 @@
+"""Внутрипроцессная шина изменений задач и поток Server-Sent Events.
+
+Мутации task_repository (их вызывают и эндпоинты /tasks, и обработчики webhook)
+публикуют компактные события:
+  task_created - {"task": {...}}
+  task_updated - {"id": N, "changes": {поле: новое значение}} - только измененные поля
+  task_deleted - {"id": N}
+  tasks_archived - {"ids": [N, ...]} - задачи перенесены в архив (archive.py)
+  stats        - {"stats": {...}} - как ответ /tasks/stats
+Статистика не пересчитывается на каждое изменение: изменения помечают ее устаревшей,
+и не чаще раза в STATS_PUSH_INTERVAL секунд подписчикам уходит один снимок из сводных таблиц.
+
+Шина живет в памяти процесса: при нескольких воркерах uvicorn клиент получает
+изменения, прошедшие через свой воркер, и изменения webhook, обработанные в нем же.
+"""
+import asyncio
+import json
+import logging
+import os
+
+from stats import read_stats
+
+logger = logging.getLogger("events")
+
+# Очередь одного подписчика; переполнение = клиент не успевает, поток закрывается
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+STATS_PUSH_INTERVAL = float(os.getenv("EVENTS_STATS_INTERVAL", "1.0"))
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+
+class Subscription:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = set()
+        self._seq = 0
+        self._stats_task = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data: dict):
+        if not self._subscribers:
+            return
+        self._seq += 1
+        event = (self._seq, event_type, data)
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Клиент переподключится и перечитает данные целиком
+                subscription.overflowed = True
+                self._subscribers.discard(subscription)
+                logger.warning("Events subscriber dropped: queue overflow")
+
+    def mark_stats_dirty(self):
+        if self._subscribers and self._stats_task is None:
+            self._stats_task = asyncio.get_running_loop().create_task(self._push_stats())
+
+    async def _push_stats(self):
+        try:
+            await asyncio.sleep(STATS_PUSH_INTERVAL)
+            self.publish("stats", {"stats": await read_stats()})
+        except Exception:
+            logger.exception("Failed to push stats")
+        finally:
+            self._stats_task = None
+
+    def __len__(self):
+        return len(self._subscribers)
+
+event_bus = EventBus()
+
+def row_to_dict(row) -> dict:
+    return {key: row[key] for key in row.keys()}
+
+def publish_task_created(task):
+    event_bus.publish("task_created", {"task": row_to_dict(task)})
+    event_bus.mark_stats_dirty()
+
+def publish_task_updated(task_id: int, changes: dict):
+    event_bus.publish("task_updated", {"id": task_id, "changes": changes})
+    event_bus.mark_stats_dirty()
+
+def publish_task_deleted(task_id: int):
+    event_bus.publish("task_deleted", {"id": task_id})
+    event_bus.mark_stats_dirty()
+
+def publish_tasks_archived(task_ids):
+    # Сводная статистика учитывает архив, поэтому перенос ее не меняет
+    event_bus.publish("tasks_archived", {"ids": list(task_ids)})
+
+def format_sse(seq: int, event_type: str, data: dict) -> str:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"id: {seq}\nevent: {event_type}\ndata: {payload}\n\n"
+
+async def sse_stream():
+    """Генератор тела ответа text/event-stream для одного клиента"""
+    subscription = event_bus.subscribe()
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Комментарий-пинг держит соединение через прокси
+                yield ": ping\n\n"
+                continue
+            yield format_sse(*event)
+    finally:
+        event_bus.unsubscribe(subscription)
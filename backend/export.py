@@ -0,0 +1,105 @@
+"""Потоковая выгрузка задач или журнала баллов в NDJSON или CSV.
+
+Строки читаются курсором (database.iterate: в Postgres - серверный курсор asyncpg,
+в SQLite - курсор aiosqlite) и сериализуются пачками по EXPORT_BATCH_SIZE строк:
+в памяти держится одна пачка, сколько бы задач ни было в таблице.
+Модели pydantic для строк не создаются - колонки пишутся напрямую.
+Архивные задачи добавляются через UNION ALL с общей сортировкой по id: это по-прежнему
+один курсор, а id в tasks и tasks_archive не пересекаются.
+При gzip каждая пачка сжимается на лету одним потоком zlib.
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+
+from database import database
+from models import tasks, tasks_archive, points_ledger
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Те же поля и в том же порядке, что у TaskOut
+EXPORT_COLUMNS = [
+    "id", "title", "description", "assignee", "watchers", "reviewers", "image_urls",
+    "status", "points", "branch_name", "branch_assignee_github_login",
+]
+LIST_COLUMNS = {"watchers", "reviewers", "image_urls"}
+
+POINTS_EXPORT_COLUMNS = ["id", "login", "task_id", "delta", "reason", "delivery_id", "created_at", "idempotency_key"]
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+def export_query(conditions, include_archived: bool = False):
+    """Задачи по условиям conditions(table), при include_archived - вместе с архивом"""
+    def select_from(table):
+        return table.select().with_only_columns(*(table.c[column] for column in EXPORT_COLUMNS)).where(*conditions(table))
+
+    if not include_archived:
+        return select_from(tasks).order_by(tasks.c.id)
+    return select_from(tasks).union_all(select_from(tasks_archive)).order_by("id")
+
+def points_export_query(login=None):
+    """Журнал баллов по порядку записей, при login - только начисления пользователя"""
+    query = points_ledger.select().with_only_columns(*(points_ledger.c[column] for column in POINTS_EXPORT_COLUMNS))
+    if login is not None:
+        query = query.where(points_ledger.c.login == login)
+    return query.order_by(points_ledger.c.id)
+
+def json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def ndjson_batch(rows, columns) -> str:
+    return "".join(
+        json.dumps({column: json_value(row[column]) for column in columns}, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+def csv_value(column: str, value):
+    if value is None:
+        return ""
+    if column in LIST_COLUMNS:
+        # Логины и URL не содержат ';' - список читается без разбора JSON
+        return ";".join(value)
+    return json_value(value)
+
+def csv_batch(rows, columns, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([csv_value(column, row[column]) for column in columns] for row in rows)
+    return buffer.getvalue()
+
+async def export_batches(query, columns, export_format: str):
+    """Текст выгрузки пачками"""
+    batch = []
+    header = export_format == "csv"
+    if header:
+        # Заголовок CSV уходит сразу, даже если строк нет
+        yield csv_batch([], columns, header=True)
+    async for row in database.iterate(query):
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield ndjson_batch(batch, columns) if export_format == "ndjson" else csv_batch(batch, columns)
+            batch = []
+    if batch:
+        yield ndjson_batch(batch, columns) if export_format == "ndjson" else csv_batch(batch, columns)
+
+async def export_stream(query, columns, export_format: str, compress: bool):
+    """Тело ответа: байты пачек, при compress - gzip-поток"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    async for text in export_batches(query, columns, export_format):
+        data = text.encode("utf-8")
+        if compressor is None:
+            yield data
+            continue
+        data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,89 @@
+"""Общий HTTP-клиент к GitHub для OAuth.
+
+Один httpx.AsyncClient на все приложение (создается в lifespan): keep-alive пул
+к github.com и api.github.com, таймауты, повторы с экспоненциальной задержкой.
+Профиль пользователя не кэшируется: он запрашивается один раз на вход, по только что
+выданному токену, и повторных запросов с тем же токеном не бывает.
+"""
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+
+logger = logging.getLogger("github_client")
+
+# Базовые адреса переопределяются, например, для локального фейкового GitHub
+GITHUB_OAUTH_URL = os.getenv("GITHUB_OAUTH_URL", "https://github.com").rstrip("/")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "10"))
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "3"))
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+GITHUB_RETRIES = int(os.getenv("GITHUB_RETRIES", "3"))
+GITHUB_BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "0.2"))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+class GitHubClient:
+    def __init__(self, oauth_url: str = GITHUB_OAUTH_URL, api_url: str = GITHUB_API_URL):
+        self.oauth_url = oauth_url
+        self.api_url = api_url
+        self._client = None
+        self.stats = {"requests": 0, "retries": 0}
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(GITHUB_TIMEOUT, connect=GITHUB_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=GITHUB_MAX_CONNECTIONS,
+                    max_keepalive_connections=GITHUB_MAX_CONNECTIONS,
+                ),
+                headers={"Accept": "application/json"},
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, url: str, retry_statuses: bool = True, **kwargs) -> httpx.Response:
+        """Запрос с повторами. Ошибки соединения повторяются всегда (запрос не дошел до GitHub),
+        429/5xx - только если retry_statuses (для неидемпотентного обмена OAuth-кода - нет)."""
+        if self._client is None:
+            await self.start()
+        for attempt in range(GITHUB_RETRIES + 1):
+            self.stats["requests"] += 1
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+                if attempt == GITHUB_RETRIES:
+                    raise
+                logger.warning(f"GitHub {method} {url}: {exc!r}, попытка {attempt + 1}")
+            else:
+                if not (retry_statuses and response.status_code in RETRY_STATUSES) or attempt == GITHUB_RETRIES:
+                    return response
+                logger.warning(f"GitHub {method} {url}: HTTP {response.status_code}, попытка {attempt + 1}")
+            self.stats["retries"] += 1
+            # Экспоненциальная задержка со случайной добавкой
+            await asyncio.sleep(GITHUB_BACKOFF_BASE * (2 ** attempt) * (1 + random.random()))
+
+    async def exchange_code(self, client_id: str, client_secret: str, code: str) -> dict:
+        """Обмен OAuth-кода на access_token"""
+        response = await self.request(
+            "POST",
+            f"{self.oauth_url}/login/oauth/access_token",
+            retry_statuses=False,
+            data={"client_id": client_id, "client_secret": client_secret, "code": code},
+        )
+        return response.json()
+
+    async def get_user(self, token: str) -> dict:
+        """Профиль пользователя по токену (GET /user)"""
+        response = await self.request("GET", f"{self.api_url}/user", headers={"Authorization": f"Bearer {token}"})
+        response.raise_for_status()
+        return response.json()
+
+github_client = GitHubClient()
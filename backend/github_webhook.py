@@ -1,91 +1,100 @@
-from fastapi import APIRouter, Request, HTTPException
-from models import tasks
-from database import database
-import re
-import json
+from fastapi import APIRouter, Request
+from webhook_queue import WebhookQueue
+from metrics import register, CallbackGauge
+from task_refs import task_ref_matcher, is_protected_branch, PR_CLOSE_REQUIRES_KEYWORD
+import task_repository
+import logging
+import os
+import uuid
+
+logger = logging.getLogger("github_webhook")
 
 router = APIRouter()
 
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+
 def extract_task_id(text: str):
-    match = re.search(r"TASK-(\d+)", text, re.IGNORECASE)
-    return int(match.group(1)) if match else None
+    """ID первой упомянутой задачи (для ключа упорядочивания)"""
+    return task_ref_matcher.first(text)
 
-async def update_task_status(task_id: int, new_status: str):
-    query = tasks.update().where(tasks.c.id == task_id).values(status=new_status)
-    await database.execute(query)
+async def update_task_status(task_id: int, new_status: str, delivery_id: str = None):
+    return await task_repository.set_status(task_id, new_status, delivery_id=delivery_id)
 
 async def update_task_branch(task_id: int, branch_name: str):
-    query = tasks.update().where(tasks.c.id == task_id, tasks.c.branch_name == None).values(branch_name=branch_name)
-    await database.execute(query)
-
-async def add_points_to_assignee(task_id: int, points_to_add: int):
-    # Сначала получаем текущие баллы и assignee
-    query = tasks.select().where(tasks.c.id == task_id)
-    task_data = await database.fetch_one(query)
-    
-    if task_data:
-        # Получаем assignee (обычного или из ветки)
-        current_assignee = task_data["branch_assignee_github_login"] or task_data["assignee"]
-        
-        if current_assignee: # Убедимся, что assignee существует
-            current_points = task_data["points"] or 0
-            new_points = current_points + points_to_add
-            
-            # Обновляем только баллы, не трогая статус или assignee
-            update_query = tasks.update().where(tasks.c.id == task_id).values(points=new_points)
-            await database.execute(update_query)
-            print(f"Added {points_to_add} points to {current_assignee} for task {task_id}. New total: {new_points}")
-        else:
-             print(f"Task {task_id} has no assignee or branch assignee, points not added.")
-    else:
-        print(f"Task {task_id} not found, could not add points.")
+    await task_repository.link_branch(task_id, branch_name)
 
-@router.post("/webhook")
-async def github_webhook(request: Request):
-    event = request.headers.get("X-GitHub-Event")
-    payload = await request.json()
+def commit_messages(payload: dict) -> str:
+    """Сообщения всех коммитов push одной строкой - ссылки ищутся за один проход"""
+    return "\n".join(commit.get("message") or "" for commit in payload.get("commits", []))
+
+def ordering_key(event: str, payload: dict):
+    """Ключ упорядочивания события: все задачи, которые оно может изменить ("task:1,task:7"),
+    а если их нет - ветка. Ссылки берутся с запасом (без учета ключевых слов)"""
+    task_ids = set()
+    if event == "push":
+        branch_name = payload.get("ref", "").replace("refs/heads/", "")
+        task_ids.update(task_ref_matcher.find_all(commit_messages(payload)))
+    elif event in ("pull_request", "pull_request_review"):
+        pr_data = payload.get("pull_request", {})
+        branch_name = pr_data.get("head", {}).get("ref", "")
+        if event == "pull_request":
+            task_ids.update(task_ref_matcher.find_all(pr_data.get("body") or ""))
+    elif event == "create":
+        branch_name = payload.get("ref") or ""
+    else:
+        return None
+    task_ids.update(task_ref_matcher.find_all(branch_name))
+    if task_ids:
+        return ",".join(f"task:{task_id}" for task_id in sorted(task_ids))
+    return f"branch:{branch_name}" if branch_name else None
 
+async def process_event(event: str, payload: dict, delivery_id: str = None):
+    """Применяет GitHub-событие к задачам (вызывается воркерами очереди)"""
     if event == "push":
         pushed_branch = payload.get("ref", "").replace("refs/heads/", "")
         
         if not pushed_branch:
-             print("Could not determine pushed branch from webhook payload.")
+             logger.warning("Could not determine pushed branch from webhook payload")
              return {"ok": False, "reason": "Branch not found in payload"}
 
-        for commit in payload.get("commits", []):
-            commit_message = commit.get("message", "")
-            if task_id := extract_task_id(commit_message):
-                query = tasks.select().where(tasks.c.id == task_id, tasks.c.branch_name == pushed_branch)
-                task_exists = await database.fetch_one(query)
-                
-                if task_exists:
-                    print(f"Updating task {task_id} status to 'Ожидает ревью' due to push to branch {pushed_branch}")
-                    await update_task_status(task_id, "Ожидает ревью")
-                else:
-                    print(f"Push to branch {pushed_branch} for task {task_id}, but branch is not linked or task not found.")
+        # Все ссылки из всех коммитов за один проход по склеенным сообщениям, затем один UPDATE
+        commit_task_ids = set(task_ref_matcher.find_all(commit_messages(payload)))
+
+        if commit_task_ids:
+            # Один UPDATE ... WHERE id IN (...) AND branch_name = ?, RETURNING дает обновленные задачи
+            linked_task_ids = await task_repository.set_status_many(
+                commit_task_ids, "Ожидает ревью", branch_name=pushed_branch
+            )
+
+            for task_id in sorted(linked_task_ids):
+                logger.info("Task %d status set to 'Ожидает ревью' by push to %s", task_id, pushed_branch)
+            for task_id in sorted(commit_task_ids - linked_task_ids):
+                logger.info("Push to %s for task %d ignored: branch is not linked or task not found", pushed_branch, task_id)
 
     elif event == "pull_request":
         if payload.get("action") == "closed" and payload.get("pull_request", {}).get("merged"):
             pr_data = payload.get("pull_request", {})
-            body = pr_data.get("body", "")
+            body = pr_data.get("body") or ""
             branch_name = pr_data.get("head", {}).get("ref", "") 
             base_branch = pr_data.get("base", {}).get("ref", "") # Получаем имя базовой ветки
             
-            # Ищем ID задачи в имени ветки или теле PR
-            task_id = extract_task_id(branch_name) or extract_task_id(body)
+            # Все задачи из имени ветки и описания PR (в описании - с учетом ключевых слов)
+            body_task_ids = task_ref_matcher.closing_ids(body) if PR_CLOSE_REQUIRES_KEYWORD else task_ref_matcher.find_all(body)
+            task_ids = set(task_ref_matcher.find_all(branch_name)) | set(body_task_ids)
             
-            if task_id:
-                # Проверяем, что мерж идет в основную ветку (например, 'main' или 'master')
-                # TODO: Сделать имя основной ветки настраиваемым
-                if base_branch == "main" or base_branch == "master": 
-                    print(f"PR for task {task_id} merged into {base_branch}. Closing task and adding points.")
-                    await update_task_status(task_id, "closed")
-                    # Начисляем баллы ответственному за ветку (если он назначен)
-                    await add_points_to_assignee(task_id, 10) 
+            if task_ids:
+                # Задачи закрывает только merge в защищенную ветку (PROTECTED_BRANCHES)
+                if is_protected_branch(base_branch):
+                    logger.info("PR for tasks %s merged into %s, closing tasks", sorted(task_ids), base_branch)
+                    # Закрытие начисляет бонус ответственному за ветку через журнал баллов:
+                    # отдельного начисления за merge нет, иначе задача получила бы баллы дважды
+                    closed_task_ids = await task_repository.set_status_many(task_ids, "closed", delivery_id=delivery_id)
+                    for task_id in sorted(task_ids - closed_task_ids):
+                        logger.info("Task %d not found, status not changed", task_id)
                 else:
-                     print(f"PR for task {task_id} merged into {base_branch} (not main/master). Status not changed.")
+                     logger.info("PR for tasks %s merged into %s (not protected), status not changed", sorted(task_ids), base_branch)
             else:
-                 print(f"Could not extract task ID from merged PR (branch: {branch_name}, body: {body[:50]}...)")
+                 logger.info("Could not extract task ID from merged PR (branch %s)", branch_name)
 
     elif event == "pull_request_review":
         if payload.get("action") == "submitted":
@@ -94,40 +103,28 @@ async def github_webhook(request: Request):
             pr_branch_name = payload.get("pull_request", {}).get("head", {}).get("ref", "")
             
             if not (review_state and reviewer_login and pr_branch_name):
-                print("PR Review webhook: Missing required fields (state, reviewer, branch)")
+                logger.warning("PR review webhook: missing required fields (state, reviewer, branch)")
                 return {"ok": False, "reason": "Missing fields"}
 
             task_id = extract_task_id(pr_branch_name)
             if task_id:
-                task_query = tasks.select().where(tasks.c.id == task_id)
-                task_data = await database.fetch_one(task_query)
-
-                if task_data:
-                    allowed_reviewers = task_data["reviewers"]
-                    try:
-                        allowed_reviewers_list = allowed_reviewers if allowed_reviewers is not None else []
-                    except Exception as e:
-                         allowed_reviewers_list = []
-                         print(f"Warning: Unexpected error processing reviewers for task {task_id}: {e}")
-
-                    if reviewer_login in allowed_reviewers_list:
-                        new_status = None
-                        if review_state == "approved":
-                            new_status = "Ревью пройдено"
-                        elif review_state == "changes_requested":
-                            new_status = "Требуются доработки"
-                        
-                        if new_status:
-                            print(f"Updating task {task_id} status to '{new_status}' based on review by {reviewer_login}")
-                            await update_task_status(task_id, new_status)
-                        else:
-                             print(f"Review state '{review_state}' by {reviewer_login} for task {task_id} does not trigger status change.")
+                # Проверка по индексу task_members вместо загрузки задачи и разбора JSON-списка ревьюеров
+                if await task_repository.has_member(task_id, reviewer_login, "reviewer"):
+                    new_status = None
+                    if review_state == "approved":
+                        new_status = "Ревью пройдено"
+                    elif review_state == "changes_requested":
+                        new_status = "Требуются доработки"
+                    
+                    if new_status:
+                        logger.info("Task %d status set to '%s' by review of %s", task_id, new_status, reviewer_login)
+                        await update_task_status(task_id, new_status)
                     else:
-                        print(f"Review by {reviewer_login} for task {task_id} ignored: user not in allowed reviewers.")
+                         logger.debug("Review state '%s' by %s for task %d does not change status", review_state, reviewer_login, task_id)
                 else:
-                     print(f"Task {task_id} not found for PR review event.")
+                    logger.info("Review by %s for task %d ignored: task not found or user is not a reviewer", reviewer_login, task_id)
             else:
-                print(f"Could not extract task ID from PR branch name: {pr_branch_name}")
+                logger.debug("Could not extract task ID from PR branch name %s", pr_branch_name)
 
     elif event == "create":
         if payload.get("ref_type") == "branch":
@@ -135,7 +132,26 @@ async def github_webhook(request: Request):
             if branch_name:
                 task_id = extract_task_id(branch_name)
                 if task_id:
-                    print(f"Detected branch creation for task {task_id}: {branch_name}")
+                    logger.info("Branch %s created for task %d", branch_name, task_id)
                     await update_task_branch(task_id, branch_name)
 
     return {"ok": True}
+
+webhook_queue = WebhookQueue(process_event, workers=WEBHOOK_WORKERS, key_func=ordering_key)
+register(CallbackGauge("webhook_queue_depth", "События webhook в очереди", lambda: webhook_queue.metrics()["depth"]))
+
+@router.post("/webhook")
+async def github_webhook(request: Request):
+    event = request.headers.get("X-GitHub-Event")
+    # Без X-GitHub-Delivery (ручной вызов) дедупликация невозможна - генерируем свой ID
+    delivery_id = request.headers.get("X-GitHub-Delivery") or str(uuid.uuid4())
+    payload = await request.json()
+
+    # Только сохраняем событие и сразу отвечаем GitHub, обработка - в воркерах очереди
+    queued = await webhook_queue.submit(delivery_id, event, payload)
+    return {"ok": True, "delivery_id": delivery_id, "duplicate": not queued}
+
+@router.get("/webhook/queue")
+async def webhook_queue_metrics():
+    """Глубина и задержка очереди webhook"""
+    return webhook_queue.metrics()
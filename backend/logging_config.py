@@ -0,0 +1,69 @@
+"""Настройка логирования приложения.
+
+Записи сериализуются в JSON (по одной строке) и пишутся в stderr отдельным потоком:
+обработчики запросов только кладут запись в очередь (QueueHandler), форматирование и
+запись выполняет QueueListener. Логи запросов семплируются (см. metrics.py).
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json - для сбора логов, text - для чтения глазами при разработке
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Стандартные атрибуты LogRecord; все остальное пришло через extra= и попадает в JSON
+RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName", "color_message"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке: стандартный prepare()
+    собирает сообщение и traceback сразу, мы откладываем это до QueueListener"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+_listener = None
+
+def setup_logging():
+    """Направляет корневой логгер через очередь; повторный вызов ничего не делает"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [DeferredQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging():
+    """Дописывает оставшиеся в очереди записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,39 +1,56 @@
-from fastapi import FastAPI, Request, File, UploadFile
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from github_webhook import router as github_router
-from database import init_db
+from github_webhook import router as github_router, webhook_queue
+from database import init_db, close_db
 from routes.tasks import router as tasks_router
+from routes.users import router as users_router
 from auth import router as auth_router
+from github_client import github_client
+from archive import archive_job
+from stats import stats_fold_job
+from task_cache import task_cache
+from uploads import router as uploads_router, init_upload_dirs, UPLOAD_DIR
+from metrics import router as metrics_router, MetricsMiddleware
+from logging_config import setup_logging, stop_logging
 from contextlib import asynccontextmanager
-import logging
-import shutil
-import os
-
-UPLOAD_DIR = "backend/uploads"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Код выполняется при запуске
+    # Структурированные логи через неблокирующую очередь (см. logging_config.py)
+    setup_logging()
+
     # Создаем директорию для загрузок, если она не существует
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    init_upload_dirs()
     
     # Настраиваем раздачу статики ПОСЛЕ создания директории
     # Явно указываем путь от корня
-    app.mount("/uploads", StaticFiles(directory="backend/uploads"), name="uploads")
+    app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
     
     await init_db()
+    await webhook_queue.start()
+    await github_client.start()
+    # Сбросы кэша задач от других воркеров (если задан TASK_CACHE_CHANNEL_DIR)
+    await task_cache.start()
+    # Перенос давно закрытых задач в архив (см. archive.py)
+    await archive_job.start()
+    # Свертка изменений счетчиков статусов (Postgres, см. stats.py)
+    await stats_fold_job.start()
     yield
     # Код выполняется при завершении
-    # Здесь можно добавить закрытие соединений с БД при необходимости
+    # Необработанные webhook остаются в БД и будут подхвачены при следующем запуске
+    await stats_fold_job.stop()
+    await archive_job.stop()
+    await task_cache.stop()
+    await webhook_queue.stop()
+    await github_client.close()
+    await close_db()
+    stop_logging()
 
 
 app = FastAPI(lifespan=lifespan)
 
-# Настройка логирования для отладки
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("app")
-
 # Настройка CORS
 origins = [
     "http://localhost:5173",
@@ -49,39 +66,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Добавляем middleware для логирования запросов
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
-    logger.info(f"Headers: {request.headers}")
-    response = await call_next(request)
-    logger.info(f"Response: {response.status_code}")
-    return response
+# Латентность, запросы в обработке и семплированный лог запросов; метрики - GET /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Подключение маршрутов
 app.include_router(github_router)
 app.include_router(tasks_router)
+app.include_router(users_router)
 app.include_router(auth_router)
-
-# Эндпоинт для загрузки файлов
-@app.post("/uploads/")
-async def upload_file(file: UploadFile = File(...)):
-    # Сохраняем в директорию UPLOAD_DIR (т.е. backend/uploads/)
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    # Генерируем уникальное имя файла, если файл с таким именем уже существует
-    base, extension = os.path.splitext(file.filename)
-    counter = 1
-    while os.path.exists(file_path):
-        # Используем UPLOAD_DIR для генерации пути
-        file_path = os.path.join(UPLOAD_DIR, f"{base}_{counter}{extension}")
-        counter += 1
-        
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    finally:
-        file.file.close()
-        
-    # Возвращаем относительный URL
-    # Имя файла берем из конечного file_path, чтобы учесть возможные _{counter}
-    return {"url": f"/uploads/{os.path.basename(file_path)}"}
\ No newline at end of file
+app.include_router(uploads_router)
+app.include_router(metrics_router)
@@ -0,0 +1,157 @@
+"""Метрики приложения в формате Prometheus и middleware запросов.
+
+Все счетчики живут в памяти процесса и обновляются без блокировок (один event loop).
+MetricsMiddleware - чистый ASGI-middleware: меряет латентность по шаблону маршрута,
+число запросов в обработке и пишет семплированный структурированный лог запроса.
+"""
+import bisect
+import logging
+import os
+import random
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger("http")
+
+router = APIRouter()
+
+# Доля логируемых запросов; ошибки 5xx и медленные запросы логируются всегда
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        # Метрика без меток видна в /metrics сразу, с нулевым значением
+        self._values = {} if self.labelnames else {(): 0}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class CallbackGauge:
+    """Gauge, значение которого вычисляется при чтении /metrics"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, func):
+        self.name, self.help, self.func = name, help, func
+
+    def samples(self):
+        yield f"{self.name} {self.func()}"
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [счетчики по корзинам (последняя - +Inf), сумма]
+        self._values = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames + ("le",), labels + (bound,))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            base_labels = format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{base_labels} {total}"
+            yield f"{self.name}_count{base_labels} {cumulative}"
+
+REGISTRY = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+http_request_duration = register(Histogram(
+    "http_request_duration_seconds", "Латентность HTTP-запросов", ("method", "route", "status")
+))
+http_requests_in_flight = register(Gauge("http_requests_in_flight", "Запросы в обработке"))
+db_query_duration = register(Histogram(
+    "db_query_duration_seconds", "Длительность запросов к БД", ("operation",)
+))
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            # Шаблон маршрута (/tasks/{task_id}), а не сам путь: число серий ограничено
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(elapsed, scope["method"], route_path, status)
+
+            elapsed_ms = elapsed * 1000
+            if status >= 500 or elapsed_ms >= REQUEST_LOG_SLOW_MS or random.random() < REQUEST_LOG_SAMPLE_RATE:
+                logger.info(
+                    "request",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": route_path,
+                        "status": status,
+                        "duration_ms": round(elapsed_ms, 2),
+                    },
+                )
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
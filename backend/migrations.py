@@ -0,0 +1,236 @@
+"""Миграции схемы БД (замена metadata.create_all).
+
+Каждая миграция - функция, получающая синхронное соединение SQLAlchemy; применяется
+один раз, номер записывается в schema_migrations. Все шаги идемпотентны (checkfirst,
+IF NOT EXISTS), поэтому база, созданная раньше через create_all, просто догоняется
+до текущей версии. Новые миграции добавляются в конец списка MIGRATIONS.
+
+Запуск вручную (из backend/):
+    python migrations.py            # применить недостающие миграции
+    python migrations.py --status   # показать примененные и ожидающие
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger("migrations")
+
+# Служебная таблица держится в отдельной MetaData, чтобы не смешиваться с моделями
+schema_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+# Ключ advisory-lock в Postgres: миграции из нескольких воркеров выполняются по очереди
+POSTGRES_LOCK_KEY = 727100
+
+def add_column_if_missing(connection, table, column_name: str):
+    """ALTER TABLE ... ADD COLUMN для колонки из модели, если ее еще нет в таблице
+    (таблица, созданная свежей миграцией 1, уже содержит все колонки модели)"""
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=connection.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    connection.execute(text(ddl))
+
+def create_tasks_table(connection):
+    """Таблица задач; в SQLite id с AUTOINCREMENT, чтобы id удаленных и архивных задач
+    не выдавались снова (см. models.tasks).
+
+    В базе, созданной раньше через create_all, tasks без AUTOINCREMENT. Колонку нельзя изменить
+    через ALTER, поэтому таблица пересоздается по модели с копией строк: триггеров на tasks на этом
+    шаге еще нет, индексы модели строит миграция 2, а счетчик id SQLite берет из вставленных строк.
+    """
+    from models import tasks
+    if connection.dialect.name != "sqlite" or not inspect(connection).has_table("tasks"):
+        tasks.create(connection, checkfirst=True)
+        return
+    schema = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'")).scalar()
+    if "AUTOINCREMENT" in schema.upper():
+        return
+    existing = {column["name"] for column in inspect(connection).get_columns("tasks")}
+    columns = ", ".join(column.name for column in tasks.columns if column.name in existing)
+    connection.execute(CreateTable(tasks.to_metadata(MetaData(), name="tasks_rebuilt")))
+    connection.execute(text(f"INSERT INTO tasks_rebuilt ({columns}) SELECT {columns} FROM tasks"))
+    connection.execute(text("DROP TABLE tasks"))
+    connection.execute(text("ALTER TABLE tasks_rebuilt RENAME TO tasks"))
+
+def create_task_list_indexes(connection):
+    from models import tasks
+    for index in tasks.indexes:
+        index.create(connection, checkfirst=True)
+
+def create_stats_tables(connection):
+    from models import task_status_counts, task_status_deltas
+    from stats import install_stats_triggers, backfill_stats
+    task_status_counts.create(connection, checkfirst=True)
+    # Триггеры Postgres пишут изменения счетчиков в task_status_deltas (см. stats.py)
+    task_status_deltas.create(connection, checkfirst=True)
+    install_stats_triggers(connection)
+    backfill_stats(connection)
+
+def create_webhook_deliveries_table(connection):
+    from models import webhook_deliveries
+    webhook_deliveries.create(connection, checkfirst=True)
+    for index in webhook_deliveries.indexes:
+        index.create(connection, checkfirst=True)
+
+def create_task_members_table(connection):
+    """Таблица участников + разовый перенос ревьюеров/наблюдателей из JSON-колонок"""
+    from models import tasks, task_members
+    from task_repository import member_rows
+    task_members.create(connection, checkfirst=True)
+    for index in task_members.indexes:
+        index.create(connection, checkfirst=True)
+
+    connection.execute(task_members.delete())
+    last_id, batch_size = 0, 1000
+    while True:
+        batch = connection.execute(
+            select(tasks.c.id, tasks.c.reviewers, tasks.c.watchers)
+            .where(tasks.c.id > last_id)
+            .order_by(tasks.c.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        rows = [
+            member
+            for task in batch
+            for member in member_rows(task.id, {"reviewers": task.reviewers, "watchers": task.watchers})
+        ]
+        if rows:
+            connection.execute(task_members.insert(), rows)
+        last_id = batch[-1].id
+
+def create_search_index(connection):
+    from search import install_search_index
+    install_search_index(connection)
+
+def create_sessions_table(connection):
+    from models import sessions
+    sessions.create(connection, checkfirst=True)
+    for index in sessions.indexes:
+        index.create(connection, checkfirst=True)
+
+def add_version_columns(connection):
+    """Версии строк и таблицы tasks для ETag"""
+    from models import tasks, table_versions
+    from versions import install_version_triggers, TASKS_VERSION_KEY
+    add_column_if_missing(connection, tasks, "version")
+    table_versions.create(connection, checkfirst=True)
+    dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+    connection.execute(
+        dialect.insert(table_versions).values(name=TASKS_VERSION_KEY, version=1).on_conflict_do_nothing()
+    )
+    install_version_triggers(connection)
+
+def create_points_ledger(connection):
+    """Журнал баллов и суммы по пользователям; текущие баллы задач переносятся в журнал"""
+    from models import points_ledger, user_points
+    from stats import install_ledger_triggers, backfill_user_points
+    points_ledger.create(connection, checkfirst=True)
+    user_points.create(connection, checkfirst=True)
+    install_ledger_triggers(connection)
+    # Ключ close:{id} совпадает с ключом бонуса за закрытие: перенесенные баллы не начислятся повторно
+    connection.execute(text("""
+        INSERT INTO points_ledger (login, task_id, delta, reason, delivery_id, created_at, idempotency_key)
+        SELECT COALESCE(branch_assignee_github_login, assignee), id, points, 'backfill', NULL, :now,
+               'close:' || CAST(id AS VARCHAR)
+        FROM tasks
+        WHERE points > 0 AND COALESCE(branch_assignee_github_login, assignee) IS NOT NULL
+        ON CONFLICT (idempotency_key) DO NOTHING
+    """), {"now": datetime.now(timezone.utc).replace(tzinfo=None)})
+    backfill_user_points(connection)
+
+def create_tasks_archive(connection):
+    """Время закрытия задач и архив давно закрытых задач (см. archive.py)"""
+    from models import tasks, tasks_archive
+    from stats import install_archive_stats_triggers
+    from versions import install_archive_version_triggers
+    add_column_if_missing(connection, tasks, "closed_at")
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_status_closed_at ON tasks (status, closed_at)"))
+    tasks_archive.create(connection, checkfirst=True)
+    for index in tasks_archive.indexes:
+        index.create(connection, checkfirst=True)
+    install_archive_stats_triggers(connection)
+    install_archive_version_triggers(connection)
+    # Уже закрытым задачам время закрытия берем из бонуса close:{id} в журнале,
+    # а без него считаем, что задача закрыта сейчас
+    connection.execute(text("""
+        UPDATE tasks SET closed_at = COALESCE(
+            (SELECT created_at FROM points_ledger WHERE idempotency_key = 'close:' || CAST(tasks.id AS VARCHAR)),
+            :now
+        )
+        WHERE status = 'closed' AND closed_at IS NULL
+    """), {"now": datetime.now(timezone.utc).replace(tzinfo=None)})
+
+MIGRATIONS = [
+    (1, "create_tasks_table", create_tasks_table),
+    (2, "create_task_list_indexes", create_task_list_indexes),
+    (3, "create_stats_tables", create_stats_tables),
+    (4, "create_webhook_deliveries_table", create_webhook_deliveries_table),
+    (5, "create_task_members_table", create_task_members_table),
+    (6, "create_search_index", create_search_index),
+    (7, "create_sessions_table", create_sessions_table),
+    (8, "add_version_columns", add_version_columns),
+    (9, "create_points_ledger", create_points_ledger),
+    (10, "create_tasks_archive", create_tasks_archive),
+]
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return {row.version for row in connection.execute(schema_migrations.select())}
+
+def run_migrations(engine):
+    """Применяет недостающие миграции; возвращает список примененных номеров"""
+    applied = []
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": POSTGRES_LOCK_KEY})
+        done = applied_versions(connection)
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info("Применение миграции %04d_%s", version, name)
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            ))
+            applied.append(version)
+    return applied
+
+def migration_status(engine):
+    """[(номер, имя, применена ли)] для всех известных миграций"""
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("--status", action="store_true", help="показать состояние миграций и выйти")
+    args = parser.parse_args()
+
+    from database import engine
+    if args.status:
+        for version, name, is_applied in migration_status(engine):
+            print(f"{'+' if is_applied else ' '} {version:04d}_{name}")
+    else:
+        applied = run_migrations(engine)
+        print(f"Применено миграций: {len(applied)}")
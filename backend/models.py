@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, String, Boolean, JSON
+from sqlalchemy import Table, Column, Integer, BigInteger, String, Boolean, JSON, DateTime, ForeignKey, Index
 from database import metadata
 
 tasks = Table(
@@ -15,5 +15,129 @@ tasks = Table(
     Column("watchers", JSON, nullable=True),
     Column("image_urls", JSON, nullable=True),
     Column("branch_name", String, nullable=True),
-    Column("branch_assignee_github_login", String, nullable=True)
+    Column("branch_assignee_github_login", String, nullable=True),
+    # Версия строки для ETag, растет при каждом изменении (см. versions.py)
+    Column("version", Integer, nullable=False, server_default="1"),
+    # Когда задача перешла в closed (NULL, пока открыта); по нему задачи уходят в архив (archive.py)
+    Column("closed_at", DateTime, nullable=True),
+    # AUTOINCREMENT: SQLite не выдает повторно id удаленных и перенесенных в архив задач
+    # (иначе новая задача унаследует участников, ключи баллов и строку архива старой)
+    sqlite_autoincrement=True
+)
+
+# Составные индексы под фильтры и keyset-пагинацию списка задач (WHERE <поле> = ? AND id > ? ORDER BY id)
+Index("ix_tasks_status_id", tasks.c.status, tasks.c.id)
+Index("ix_tasks_assignee_id", tasks.c.assignee, tasks.c.id)
+Index("ix_tasks_branch_name_id", tasks.c.branch_name, tasks.c.id)
+# Индекс (status, closed_at) для отбора задач в архив создает миграция 10: миграция 2 строит
+# все индексы tasks, а в базе, созданной через create_all, колонки closed_at тогда еще нет
+
+# Архив давно закрытых задач (см. archive.py): колонки tasks плюс время переноса.
+# Строки архива не меняются; новую колонку tasks нужно добавлять миграцией и сюда
+tasks_archive = Table(
+    "tasks_archive",
+    metadata,
+    *(
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable, autoincrement=False)
+        for column in tasks.columns
+    ),
+    Column("archived_at", DateTime, nullable=False)
+)
+
+Index("ix_tasks_archive_assignee_id", tasks_archive.c.assignee, tasks_archive.c.id)
+
+# Сводные счетчики статусов для /tasks/stats. Поддерживаются триггерами на tasks (см. stats.py),
+# поэтому обновляются в той же транзакции, что и сама задача
+task_status_counts = Table(
+    "task_status_counts",
+    metadata,
+    Column("status", String, primary_key=True),
+    Column("count", Integer, nullable=False, default=0)
+)
+
+# Postgres: триггеры не обновляют task_status_counts, а дописывают сюда +1/-1 по статусу, так что
+# конкурентные записи задач не блокируют друг друга на строках счетчиков. Счетчик статуса - сумма
+# task_status_counts и этих строк; фоновая свертка (stats.StatsFoldJob) переносит их в task_status_counts
+task_status_deltas = Table(
+    "task_status_deltas",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("status", String, nullable=False),
+    Column("delta", Integer, nullable=False)
+)
+
+# Журнал начислений баллов: только добавление строк. Ключ идемпотентности не дает
+# начислить одно и то же дважды (например, close:{task_id} - бонус за закрытие задачи)
+points_ledger = Table(
+    "points_ledger",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("login", String, nullable=False),
+    Column("task_id", Integer, nullable=True),
+    Column("delta", Integer, nullable=False),
+    Column("reason", String, nullable=False),
+    Column("delivery_id", String, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("idempotency_key", String, nullable=False, unique=True),
+    Index("ix_points_ledger_login_id", "login", "id")
+)
+
+# Сумма баллов пользователя по журналу (поддерживается триггером, см. stats.py)
+user_points = Table(
+    "user_points",
+    metadata,
+    Column("login", String, primary_key=True),
+    Column("points", Integer, nullable=False),
+    Index("ix_user_points_points", "points")
+)
+
+# Журнал входящих GitHub webhook. Ключ - X-GitHub-Delivery, поэтому повторная доставка
+# того же события не создает новой записи и не обрабатывается второй раз
+webhook_deliveries = Table(
+    "webhook_deliveries",
+    metadata,
+    Column("delivery_id", String, primary_key=True),
+    Column("event", String, nullable=True),
+    Column("payload", JSON, nullable=False),
+    Column("ordering_key", String, nullable=True),
+    Column("status", String, nullable=False, default="pending"),  # pending / processing / done / failed
+    Column("error", String, nullable=True),
+    Column("received_at", DateTime, nullable=False),
+    Column("processed_at", DateTime, nullable=True),
+    # Когда событие взято в processing; по нему при запуске находятся брошенные события (webhook_queue.py)
+    Column("claimed_at", DateTime, nullable=True)
+)
+
+Index("ix_webhook_deliveries_status_received", webhook_deliveries.c.status, webhook_deliveries.c.received_at)
+
+# Участники задач (ревьюеры и наблюдатели) в нормализованном виде. Дублирует JSON-колонки
+# reviewers/watchers, синхронизируется при создании и изменении задачи (task_repository)
+# и позволяет искать задачи участника по индексу, не разбирая JSON каждой строки
+MEMBER_ROLES = ("reviewer", "watcher")
+
+task_members = Table(
+    "task_members",
+    metadata,
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("role", String, primary_key=True),  # reviewer / watcher
+    Column("login", String, primary_key=True)
+)
+
+Index("ix_task_members_login_role_task", task_members.c.login, task_members.c.role, task_members.c.task_id)
+
+# Сессии пользователей (бэкенд SESSION_BACKEND=database, см. sessions.py)
+sessions = Table(
+    "sessions",
+    metadata,
+    Column("session_id", String, primary_key=True),
+    Column("user_info", JSON, nullable=False),
+    Column("expires_at", DateTime, nullable=False, index=True)
+)
+
+# Версии таблиц для ETag: name -> счетчик изменений (поддерживается триггерами, см. versions.py)
+table_versions = Table(
+    "table_versions",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("version", BigInteger, nullable=False)
 )
@@ -0,0 +1,324 @@
+"""Повторная обработка записанных GitHub webhook и загрузка истории.
+
+Источник - файл NDJSON, директория с записями (*.json, *.ndjson, *.jsonl; файлы
+читаются в порядке имен), URL ленты событий (NDJSON или JSON-массив) или события
+из webhook_deliveries, обработка которых завершилась ошибкой (--failed).
+Формат записи:
+    {"event": "push", "delivery_id": "...", "payload": {...}}
+    {"headers": {"X-GitHub-Event": "push", "X-GitHub-Delivery": "..."}, "body": {...}}
+    {"id": "...", "type": "PushEvent", "payload": {...}}    - GitHub Events API
+
+События применяются тем же process_event, что и у очереди webhook. Записи читаются
+пачками по REPLAY_BATCH_SIZE; пачка забирается в webhook_deliveries одним INSERT,
+затем раскладывается по REPLAY_CONCURRENCY параллельным воркерам по ключу
+упорядочивания, поэтому события одной задачи применяются строго в порядке источника.
+Идемпотентность - по delivery_id: уже обработанные доставки пропускаются, упавшие
+обрабатываются заново. Записи без delivery_id получают ID из хэша события и payload.
+
+Запуск из backend/:
+    python replay.py recorded.ndjson
+    python replay.py recordings/ --concurrency 8
+    python replay.py http://localhost:9000/events
+    python replay.py --failed
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+
+from database import database, init_db, close_db
+from github_webhook import process_event, ordering_key, WEBHOOK_WORKERS
+from models import webhook_deliveries
+from webhook_queue import insert_ignore_duplicates, key_lanes, utcnow
+
+logger = logging.getLogger("replay")
+
+REPLAY_BATCH_SIZE = int(os.getenv("REPLAY_BATCH_SIZE", "1000"))
+REPLAY_CONCURRENCY = int(os.getenv("REPLAY_CONCURRENCY", str(WEBHOOK_WORKERS)))
+
+RECORD_SUFFIXES = {".json", ".ndjson", ".jsonl"}
+
+# Тип события GitHub Events API -> имя события webhook (X-GitHub-Event)
+EVENTS_API_TYPES = {
+    "PushEvent": "push",
+    "PullRequestEvent": "pull_request",
+    "PullRequestReviewEvent": "pull_request_review",
+    "CreateEvent": "create",
+}
+
+def header(headers: dict, name: str):
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+def normalize(record):
+    """(delivery_id, event, payload) из записи любого поддерживаемого формата или None"""
+    if not isinstance(record, dict):
+        return None
+    if "headers" in record:
+        headers = record["headers"] or {}
+        event = header(headers, "X-GitHub-Event")
+        delivery_id = header(headers, "X-GitHub-Delivery")
+        payload = record.get("body", record.get("payload"))
+    elif record.get("type") in EVENTS_API_TYPES:
+        event = EVENTS_API_TYPES[record["type"]]
+        delivery_id = f"events-api-{record['id']}" if record.get("id") else None
+        payload = record.get("payload")
+    else:
+        event = record.get("event")
+        delivery_id = record.get("delivery_id")
+        payload = record.get("payload")
+    if not event or not isinstance(payload, dict):
+        return None
+    if not delivery_id:
+        # Повторный запуск по тому же файлу должен давать те же ID
+        digest = hashlib.sha1(f"{event}\n{json.dumps(payload, sort_keys=True)}".encode()).hexdigest()
+        delivery_id = f"replay-{digest}"
+    return str(delivery_id), event, payload
+
+def parse_text(text: str):
+    """Записи из содержимого файла: JSON-объект, JSON-массив или NDJSON"""
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        yield from json.loads(stripped)
+        return
+    try:
+        yield json.loads(stripped)
+        return
+    except json.JSONDecodeError:
+        pass
+    for line in text.splitlines():
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+def read_ndjson(path: Path):
+    # Построчно: файл за месяцы истории не загружается в память целиком
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield None
+
+def read_path(path: Path):
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            if child.is_file() and child.suffix in RECORD_SUFFIXES:
+                yield from read_path(child)
+    elif path.suffix in (".ndjson", ".jsonl"):
+        yield from read_ndjson(path)
+    else:
+        yield from parse_text(path.read_text(encoding="utf-8"))
+
+async def read_url(url: str):
+    from github_client import github_client
+    await github_client.start()
+    try:
+        response = await github_client.request("GET", url)
+        response.raise_for_status()
+        records = list(parse_text(response.text))
+    finally:
+        await github_client.close()
+    # Лента Events API отдается от новых к старым
+    if records and all(isinstance(record, dict) and "created_at" in record for record in records):
+        records.sort(key=lambda record: record["created_at"])
+    for record in records:
+        yield record
+
+async def read_failed():
+    """Упавшие доставки из webhook_deliveries в порядке получения"""
+    query = (
+        select(webhook_deliveries.c.delivery_id, webhook_deliveries.c.event, webhook_deliveries.c.payload)
+        .where(webhook_deliveries.c.status == "failed")
+        .order_by(webhook_deliveries.c.received_at)
+    )
+    for row in await database.fetch_all(query):
+        yield {"event": row["event"], "delivery_id": row["delivery_id"], "payload": row["payload"]}
+
+async def read_records(source):
+    if source is None:
+        async for record in read_failed():
+            yield record
+    elif source.startswith(("http://", "https://")):
+        async for record in read_url(source):
+            yield record
+    else:
+        for record in read_path(Path(source)):
+            yield record
+
+class Replayer:
+    def __init__(self, concurrency: int = REPLAY_CONCURRENCY, batch_size: int = REPLAY_BATCH_SIZE):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.counters = {"read": 0, "invalid": 0, "replayed": 0, "skipped": 0, "ignored": 0, "failed": 0}
+
+    async def claim(self, batch):
+        """Забирает доставки пачки в обработку; возвращает записи, которые нужно применить"""
+        now = utcnow()
+        rows = [
+            {
+                "delivery_id": delivery_id,
+                "event": event,
+                "payload": payload,
+                "ordering_key": key,
+                "status": "processing",
+                "received_at": now,
+                "claimed_at": now,
+            }
+            for delivery_id, event, payload, key in batch
+        ]
+        query = insert_ignore_duplicates(webhook_deliveries).values(rows).returning(webhook_deliveries.c.delivery_id)
+        claimed = {row["delivery_id"] for row in await database.fetch_all(query)}
+
+        # Уже известные доставки: упавшие и еще не взятые очередью обрабатываем заново
+        known = [record[0] for record in batch if record[0] not in claimed]
+        if known:
+            query = (
+                webhook_deliveries.update()
+                .where(webhook_deliveries.c.delivery_id.in_(known), webhook_deliveries.c.status.in_(["failed", "pending"]))
+                .values(status="processing", error=None, claimed_at=now)
+                .returning(webhook_deliveries.c.delivery_id)
+            )
+            claimed.update(row["delivery_id"] for row in await database.fetch_all(query))
+        self.counters["skipped"] += len(batch) - len(claimed)
+        return [record for record in batch if record[0] in claimed]
+
+    async def run_lane(self, records, done, failed):
+        for delivery_id, event, payload, _ in records:
+            try:
+                result = await process_event(event, payload, delivery_id)
+            except Exception as e:
+                logger.error("Ошибка обработки webhook %s (%s): %s", delivery_id, event, e)
+                failed.append((delivery_id, str(e)))
+                continue
+            if result and not result.get("ok", True):
+                self.counters["ignored"] += 1
+            done.append(delivery_id)
+
+    async def finish(self, done, failed, unfinished):
+        now = utcnow()
+        if done:
+            await database.execute(
+                webhook_deliveries.update()
+                .where(webhook_deliveries.c.delivery_id.in_(done))
+                .values(status="done", error=None, processed_at=now)
+            )
+        for delivery_id, error in failed:
+            await database.execute(
+                webhook_deliveries.update()
+                .where(webhook_deliveries.c.delivery_id == delivery_id)
+                .values(status="failed", error=error, processed_at=now)
+            )
+        if unfinished:
+            # Прерванный запуск: возвращаем доставки в очередь, чтобы их не потерять
+            await database.execute(
+                webhook_deliveries.update()
+                .where(webhook_deliveries.c.delivery_id.in_(unfinished))
+                .values(status="pending", claimed_at=None)
+            )
+
+    async def replay_batch(self, batch):
+        records = await self.claim(batch)
+        # Как в WebhookQueue: один ключ - один воркер, порядок источника сохраняется.
+        # Событие нескольких задач объединяет их воркеры в одну полосу (merged: полоса -> куда слита)
+        merged = list(range(self.concurrency))
+
+        def lane_of(index):
+            while merged[index] != index:
+                index = merged[index]
+            return index
+
+        placed = []
+        for position, record in enumerate(records):
+            key = record[3]
+            indexes = key_lanes(key, self.concurrency) if key is not None else [position % self.concurrency]
+            target, *others = sorted({lane_of(index) for index in indexes})
+            for index in others:
+                merged[index] = target
+            placed.append((target, record))
+        lanes = [[] for _ in range(self.concurrency)]
+        for index, record in placed:
+            lanes[lane_of(index)].append(record)
+
+        done, failed = [], []
+        try:
+            await asyncio.gather(*(self.run_lane(lane, done, failed) for lane in lanes if lane))
+        finally:
+            finished = set(done) | {delivery_id for delivery_id, _ in failed}
+            unfinished = [record[0] for record in records if record[0] not in finished]
+            await self.finish(done, failed, unfinished)
+        self.counters["replayed"] += len(done)
+        self.counters["failed"] += len(failed)
+
+    async def run(self, records):
+        """Применяет записи из асинхронного итератора; возвращает счетчики со скоростью"""
+        started = time.perf_counter()
+        batch, seen = [], set()
+        async for record in records:
+            self.counters["read"] += 1
+            normalized = normalize(record)
+            if normalized is None:
+                self.counters["invalid"] += 1
+                continue
+            delivery_id, event, payload = normalized
+            if delivery_id in seen:
+                # Дубликат внутри пачки: один INSERT не может забрать доставку дважды
+                self.counters["skipped"] += 1
+                continue
+            seen.add(delivery_id)
+            batch.append((delivery_id, event, payload, ordering_key(event, payload)))
+            if len(batch) >= self.batch_size:
+                await self.replay_batch(batch)
+                batch, seen = [], set()
+                self.log_progress(started)
+        if batch:
+            await self.replay_batch(batch)
+
+        elapsed = time.perf_counter() - started
+        return {
+            **self.counters,
+            "seconds": round(elapsed, 3),
+            "events_per_second": round(self.counters["replayed"] / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def log_progress(self, started):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Прочитано %d, применено %d, пропущено %d, ошибок %d (%.0f событий/с)",
+            self.counters["read"], self.counters["replayed"], self.counters["skipped"], self.counters["failed"],
+            self.counters["replayed"] / elapsed if elapsed else 0.0,
+        )
+
+async def _main(argv):
+    parser = argparse.ArgumentParser(description="Повторная обработка записанных GitHub webhook")
+    parser.add_argument("source", nargs="?", help="файл NDJSON/JSON, директория с записями или URL ленты событий")
+    parser.add_argument("--failed", action="store_true", help="повторить упавшие доставки из webhook_deliveries")
+    parser.add_argument("--concurrency", type=int, default=REPLAY_CONCURRENCY, help="параллельных воркеров")
+    parser.add_argument("--batch-size", type=int, default=REPLAY_BATCH_SIZE, help="записей в пачке")
+    args = parser.parse_args(argv)
+    if (args.source is None) == (not args.failed):
+        parser.error("укажите источник или --failed")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    await init_db()
+    try:
+        replayer = Replayer(concurrency=args.concurrency, batch_size=args.batch_size)
+        result = await replayer.run(read_records(args.source))
+    finally:
+        await close_db()
+
+    print(json.dumps(result, ensure_ascii=False))
+    return 1 if result["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
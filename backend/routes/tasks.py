@@ -1,8 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from models import tasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from models import tasks, tasks_archive
 from database import database
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from stats import read_stats
+from search import search_tasks
+from events import sse_stream
+from bulk import bulk_chunks
+from export import export_stream, export_query, points_export_query, EXPORT_FORMATS, EXPORT_COLUMNS, POINTS_EXPORT_COLUMNS
+from versions import table_version, task_version, weak_etag, etag_matches, set_etag, not_modified
+from serialization import FastJSONResponse, row_dict, rows_list
+from task_cache import task_cache
+import task_repository
+import heapq
+import logging
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Dict, Literal
+
+logger = logging.getLogger("tasks")
 
 router = APIRouter(prefix="/tasks")
 
@@ -36,8 +50,17 @@ class TaskOut(TaskBase):
     branch_name: Optional[str] = None
     branch_assignee_github_login: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# Поля ответа с задачей в порядке TaskOut: строки из БД сериализуются напрямую
+# (см. serialization.py), response_model остается для схемы OpenAPI
+TASK_OUT_FIELDS = tuple(TaskOut.model_fields)
+
+def task_response(task, etag: Optional[str] = None) -> FastJSONResponse:
+    response = FastJSONResponse(row_dict(task, TASK_OUT_FIELDS))
+    if etag is not None:
+        set_etag(response, etag)
+    return response
 
 # Модели для ответа /stats
 class StatusStat(BaseModel):
@@ -52,115 +75,259 @@ class StatsResponse(BaseModel):
     statuses: Dict[str, int]
     points_leaders: List[PointsLeader]
 
-@router.get("/", response_model=List[TaskOut])
-async def get_tasks():
-    query = tasks.select()
-    return await database.fetch_all(query)
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+# Результат массовой операции по каждому элементу тела (index - позиция в массиве/NDJSON)
+class BulkItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+# Страница списка задач: next_cursor = id последней задачи, None если страниц больше нет
+class TaskPage(BaseModel):
+    items: List[TaskOut]
+    next_cursor: Optional[int] = None
+
+def task_filters(
+    status: Optional[str] = None,
+    assignee: Optional[str] = None,
+    branch: Optional[str] = None,
+    reviewer: Optional[str] = None,
+    watcher: Optional[str] = None,
+    member: Optional[str] = Query(None, description="login участника (ревьюер или наблюдатель)"),
+    role: Optional[Literal["reviewer", "watcher"]] = Query(None, description="роль участника для фильтра member"),
+):
+    """Фильтры списка (общие для /tasks/ и /tasks/export): функция, строящая условия WHERE
+    для таблицы tasks или tasks_archive"""
+    def conditions(table=tasks) -> list:
+        result = []
+        if status is not None:
+            result.append(table.c.status == status)
+        if assignee is not None:
+            result.append(table.c.assignee == assignee)
+        if branch is not None:
+            result.append(table.c.branch_name == branch)
+        # Фильтры по участникам идут через индекс task_members (login, role, task_id)
+        if reviewer is not None:
+            result.append(table.c.id.in_(task_repository.member_task_ids(reviewer, "reviewer")))
+        if watcher is not None:
+            result.append(table.c.id.in_(task_repository.member_task_ids(watcher, "watcher")))
+        if member is not None:
+            result.append(table.c.id.in_(task_repository.member_task_ids(member, role)))
+        return result
+    return conditions
+
+def page_query(table, conditions, cursor: Optional[int], limit: int):
+    # Keyset-пагинация по id: стоимость запроса зависит от limit, а не от размера таблицы
+    query = table.select().where(*conditions(table)).order_by(table.c.id).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(table.c.id > cursor)
+    return query
+
+@router.get("/", response_model=TaskPage)
+async def get_tasks(
+    request: Request,
+    cursor: Optional[int] = Query(None, description="id последней задачи с предыдущей страницы"),
+    limit: int = Query(50, ge=1, le=200),
+    include_archived: bool = Query(False, description="включить задачи из архива (см. archive.py)"),
+    conditions=Depends(task_filters),
+):
+    # Версию читаем до выборки: если запись успеет пройти между ними, ETag окажется
+    # старее данных и клиент просто получит полный ответ еще раз
+    etag = weak_etag("tasks", await table_version())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    rows = await database.fetch_all(page_query(tasks, conditions, cursor, limit))
+    if include_archived:
+        # id в tasks и архиве не пересекаются (id задач не выдаются повторно, см. миграцию 1):
+        # страница - первые limit + 1 из двух упорядоченных выборок
+        archived = await database.fetch_all(page_query(tasks_archive, conditions, cursor, limit))
+        rows = list(heapq.merge(rows, archived, key=lambda task: task["id"]))[:limit + 1]
+    # Лишняя (limit + 1)-я строка говорит только о том, что есть следующая страница
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    response = FastJSONResponse({
+        "items": rows_list(items, TASK_OUT_FIELDS),
+        "next_cursor": items[-1]["id"] if has_more else None,
+    })
+    set_etag(response, etag)
+    return response
+
+def new_task_values(task: TaskCreate) -> dict:
+    return {
+        "title": task.title,
+        "description": task.description,
+        "assignee": task.assignee,
+        "watchers": task.watchers,
+        "reviewers": task.reviewers,
+        "image_urls": task.image_urls,
+        "status": "open",
+        "points": 0,
+    }
 
 @router.post("/", response_model=TaskOut)
 async def create_task(task: TaskCreate):
-    query = tasks.insert().values(
-        title=task.title,
-        description=task.description,
-        assignee=task.assignee,
-        watchers=task.watchers,
-        reviewers=task.reviewers,
-        image_urls=task.image_urls,
-        status="open",
-        points=0
-    )
-    task_id = await database.execute(query)
-    # Возвращаем созданную задачу
-    created_task = await database.fetch_one(tasks.select().where(tasks.c.id == task_id))
-    return created_task
+    # INSERT ... RETURNING: созданная задача возвращается тем же запросом
+    return task_response(await task_repository.insert(new_task_values(task)))
+
+def bulk_response(results: List[BulkItemResult]) -> dict:
+    succeeded = sum(1 for result in results if result.ok)
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+def chunk_failed(valid, exc: Exception, results: List[BulkItemResult]):
+    # Транзакция пачки откатилась целиком: ошибка у каждого ее элемента
+    logger.error("Bulk chunk failed: %s", exc, exc_info=True)
+    for index, _ in valid:
+        results.append(BulkItemResult(index=index, ok=False, error=f"Ошибка БД: {exc}"))
+
+# Массовые операции объявлены до /{task_id}, иначе "bulk" попадет в параметр пути
+@router.post("/bulk", response_model=BulkResponse)
+async def create_tasks_bulk(request: Request):
+    """Создание задач из JSON-массива или NDJSON; каждая пачка - один INSERT ... RETURNING"""
+    results = []
+    async for chunk in bulk_chunks(request, TaskCreate):
+        valid = [(index, item) for index, item, _ in chunk if item is not None]
+        results.extend(BulkItemResult(index=index, ok=False, error=error) for index, item, error in chunk if item is None)
+        try:
+            created = await task_repository.insert_many([new_task_values(item) for _, item in valid])
+        except Exception as exc:
+            chunk_failed(valid, exc, results)
+            continue
+        results.extend(BulkItemResult(index=index, ok=True, id=task["id"]) for (index, _), task in zip(valid, created))
+    results.sort(key=lambda result: result.index)
+    return bulk_response(results)
+
+@router.patch("/bulk", response_model=BulkResponse)
+async def update_tasks_bulk(request: Request):
+    """Изменение задач (элементы - поля TaskUpdate плюс id); каждая пачка - одна транзакция"""
+    results = []
+    async for chunk in bulk_chunks(request, TaskBulkUpdate):
+        valid = [(index, item) for index, item, _ in chunk if item is not None]
+        results.extend(BulkItemResult(index=index, ok=False, error=error) for index, item, error in chunk if item is None)
+        try:
+            updated = await task_repository.update_many(
+                [(item.id, item.model_dump(exclude_unset=True, exclude={"id"})) for _, item in valid]
+            )
+        except Exception as exc:
+            chunk_failed(valid, exc, results)
+            continue
+        for (index, item), task in zip(valid, updated):
+            if task:
+                results.append(BulkItemResult(index=index, ok=True, id=item.id))
+            else:
+                results.append(BulkItemResult(index=index, ok=False, id=item.id, error="Задача не найдена"))
+    results.sort(key=lambda result: result.index)
+    return bulk_response(results)
 
 @router.get("/stats", response_model=StatsResponse)
-async def get_stats():
-    # Получаем статистику по статусам задач
-    status_stats_query = """
-    SELECT status, COUNT(*) as count
-    FROM tasks
-    GROUP BY status
-    """
-    status_stats = await database.fetch_all(status_stats_query)
-    
-    # Получаем топ по баллам
-    points_query = """
-    SELECT assignee, SUM(points) as total_points
-    FROM tasks
-    GROUP BY assignee
-    ORDER BY total_points DESC
-    LIMIT 5
-    """
-    points_leaders = await database.fetch_all(points_query)
-    
-    # Преобразуем данные из БД к модели PointsLeader
-    points_leaders_out = [
-        PointsLeader(assignee=leader["assignee"], points=leader["total_points"]) 
-        for leader in points_leaders
-    ]
-    
-    return {
-        "statuses": {stat["status"]: stat["count"] for stat in status_stats},
-        "points_leaders": points_leaders_out
-    }
+async def get_stats(request: Request, response: Response):
+    # Сводные таблицы меняются только вместе с tasks, поэтому версия таблицы задач годится и здесь
+    etag = weak_etag("stats", await table_version())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    # Счетчики поддерживаются триггерами на tasks, здесь только чтение сводных таблиц
+    set_etag(response, etag)
+    return await read_stats()
+
+@router.get("/events")
+async def task_events():
+    """Поток изменений задач и статистики (Server-Sent Events), см. events.py"""
+    return StreamingResponse(
+        sse_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/export")
+async def export_tasks(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    kind: Literal["tasks", "points"] = Query("tasks", description="tasks - задачи, points - журнал баллов"),
+    include_archived: bool = Query(False, description="включить задачи из архива (см. archive.py)"),
+    login: Optional[str] = Query(None, description="для kind=points: только начисления пользователя"),
+    conditions=Depends(task_filters),
+):
+    """Потоковая выгрузка задач (фильтры - как у списка) или журнала баллов;
+    gzip, если клиент его принимает"""
+    if kind == "points":
+        query, columns = points_export_query(login), POINTS_EXPORT_COLUMNS
+    else:
+        query, columns = export_query(conditions, include_archived), EXPORT_COLUMNS
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{kind}.{extension}"
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_stream(query, columns, format, compress), media_type=media_type, headers=headers)
+
+@router.get("/search", response_model=List[TaskOut])
+async def search(
+    q: str = Query(..., min_length=1, description="слова для поиска по названию и описанию (префиксы)"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    # Полнотекстовый индекс (FTS5 / tsvector), результаты отсортированы по релевантности
+    return FastJSONResponse(rows_list(await search_tasks(q, limit), TASK_OUT_FIELDS))
 
 @router.patch("/{task_id}", response_model=TaskOut)
 async def update_task(task_id: int, task_update: TaskUpdate):
-    # Получаем задачу для проверки существования и начисления баллов
-    get_task_query = tasks.select().where(tasks.c.id == task_id)
-    current_task = await database.fetch_one(get_task_query)
-    
-    if not current_task:
+    # Один UPDATE ... RETURNING; баллы за закрытие начисляются в той же транзакции
+    updated_task = await task_repository.update(task_id, task_update.model_dump(exclude_unset=True))
+    if not updated_task:
         raise HTTPException(status_code=404, detail="Задача не найдена")
+    return task_response(updated_task)
 
-    values_to_update = task_update.dict(exclude_unset=True)
-
-    # Если статус меняется на 'closed', начисляем баллы
-    if task_update.status == "closed" and current_task.status != "closed":
-        values_to_update["points"] = current_task.points + 10
-
-    if not values_to_update:
-        # Если нет полей для обновления, возвращаем текущую задачу
-        return current_task
+# Эндпоинт для получения одной задачи по ID (в том числе из архива)
+@router.get("/{task_id}", response_model=TaskOut)
+async def get_task(task_id: int, request: Request):
+    # Готовые байты ответа из кэша процесса: без запроса к БД и сериализации (см. task_cache.py)
+    cached = task_cache.get(task_id)
+    if cached is not None:
+        body, etag = cached
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response = Response(body, media_type="application/json")
+        set_etag(response, etag)
+        return response
 
-    query = tasks.update().where(tasks.c.id == task_id).values(**values_to_update)
-    await database.execute(query)
-    
-    # Возвращаем обновленную задачу
-    updated_task = await database.fetch_one(tasks.select().where(tasks.c.id == task_id))
-    return updated_task
+    generation = task_cache.generation
+    if request.headers.get("if-none-match"):
+        # Условный запрос: сначала только версия строки
+        version = await task_version(task_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Задача не найдена")
+        etag = weak_etag("task", task_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
 
-# Эндпоинт для получения одной задачи по ID
-@router.get("/{task_id}", response_model=TaskOut)
-async def get_task(task_id: int):
-    query = tasks.select().where(tasks.c.id == task_id)
-    task = await database.fetch_one(query)
+    task = await task_repository.get(task_id) or await task_repository.get_archived(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Задача не найдена")
-    return task
+    etag = weak_etag("task", task_id, task["version"])
+    response = task_response(task, etag)
+    task_cache.put(task_id, response.body, etag, generation)
+    return response
 
 # Новый эндпоинт для назначения ответственного за ветку
 @router.patch("/{task_id}/assign_branch", response_model=TaskOut)
 async def assign_branch_responsible(task_id: int, assignee_update: BranchAssigneeUpdate):
-    # 1. Сначала проверяем, существует ли задача
-    # Вызываем read_task, который вернет 404, если задачи нет.
-    await get_task(task_id)
-    
-    # 2. Если задача существует (иначе read_task вызвал бы исключение), обновляем ее
-    query = tasks.update().where(tasks.c.id == task_id).values(
-        branch_assignee_github_login=assignee_update.branch_assignee_github_login,
-        assignee=assignee_update.branch_assignee_github_login # Обновляем и основное поле assignee
-    )
-    await database.execute(query) # Выполняем обновление
-
-    # 3. Возвращаем обновленную задачу (снова вызываем get_task)
-    return await get_task(task_id)
+    # Обновляем и ответственного за ветку, и основное поле assignee
+    task = await task_repository.assign_branch(task_id, assignee_update.branch_assignee_github_login)
+    if not task:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return task_response(task)
 
 @router.delete("/{task_id}", status_code=204)
 async def delete_task(task_id: int):
-    # Сначала проверим, существует ли задача, чтобы вернуть 404, если нет
-    await get_task(task_id)
-    query = tasks.delete().where(tasks.c.id == task_id)
-    await database.execute(query)
+    # 404 определяем по результату DELETE ... RETURNING, без предварительного SELECT
+    if not await task_repository.delete(task_id):
+        raise HTTPException(status_code=404, detail="Задача не найдена")
     return None
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Query
+from models import points_ledger, user_points
+from database import database
+from sqlalchemy import select
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+router = APIRouter(prefix="/users")
+
+class PointsEntry(BaseModel):
+    id: int
+    task_id: Optional[int] = None
+    delta: int
+    reason: str
+    delivery_id: Optional[str] = None
+    created_at: datetime
+
+# Баллы пользователя: итог из user_points и история начислений, новые сначала.
+# next_cursor = id последней записи истории, None если страниц больше нет
+class UserPoints(BaseModel):
+    login: str
+    points: int
+    history: List[PointsEntry]
+    next_cursor: Optional[int] = None
+
+@router.get("/{login}/points", response_model=UserPoints)
+async def get_user_points(
+    login: str,
+    cursor: Optional[int] = Query(None, description="id последней записи с предыдущей страницы"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    total = await database.fetch_val(select(user_points.c.points).where(user_points.c.login == login))
+
+    # Индекс (login, id): история читается диапазоном индекса, без сортировки
+    query = (
+        points_ledger.select()
+        .where(points_ledger.c.login == login)
+        .order_by(points_ledger.c.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(points_ledger.c.id < cursor)
+
+    rows = await database.fetch_all(query)
+    has_more = len(rows) > limit
+    history = rows[:limit]
+    return {
+        "login": login,
+        "points": total or 0,
+        "history": history,
+        "next_cursor": history[-1]["id"] if has_more else None,
+    }
@@ -0,0 +1,118 @@
+"""Полнотекстовый поиск по названию и описанию задач.
+
+SQLite: внешняя FTS5-таблица tasks_fts (content='tasks'), которую поддерживают триггеры
+на tasks. Postgres: генерируемая колонка tasks.search_vector (tsvector) с GIN-индексом.
+В обоих случаях индекс обновляется самой БД при любой записи в tasks, а результаты
+ранжируются (bm25 / ts_rank). Каждое слово запроса ищется как префикс.
+
+Триггеры FTS5 пишут в tasks_fts внутри транзакции записи задачи, поэтому в SQLite
+транзакции приложения должны начинаться с BEGIN IMMEDIATE (см. database.TunedSQLiteConnection):
+отложенная транзакция не может повысить блокировку до записи при конкурентной записи.
+"""
+import re
+
+from sqlalchemy import column, func, literal_column, select, table, text
+
+from database import database
+from models import tasks
+
+# Конфигурация 'simple' в Postgres и unicode61 в SQLite: без стемминга, одинаково для
+# русского и английского текста, регистр не учитывается
+SQLITE_FTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    "DROP TRIGGER IF EXISTS tasks_fts_insert",
+    """
+    CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO tasks_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_fts_delete",
+    """
+    CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks
+    BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', OLD.id, OLD.title, OLD.description);
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_fts_update",
+    """
+    CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title, description ON tasks
+    BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        INSERT INTO tasks_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+    END
+    """,
+    # Индексируем уже существующие задачи
+    "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_FTS = [
+    """
+    ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+# FTS5-таблица и tsvector-колонка не описаны в models.py, ссылаемся на них напрямую
+tasks_fts = table("tasks_fts", column("rowid"))
+FTS5_TABLE = literal_column("tasks_fts")
+SEARCH_VECTOR = literal_column("tasks.search_vector")
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def install_search_index(connection):
+    """Создает полнотекстовый индекс и заполняет его существующими задачами"""
+    statements = POSTGRES_FTS if connection.dialect.name == "postgresql" else SQLITE_FTS
+    for statement in statements:
+        connection.execute(text(statement))
+
+def build_match_query(q: str, dialect: str):
+    """Превращает пользовательский ввод в префиксный запрос; None, если слов нет.
+
+    Спецсимволы синтаксиса FTS5/tsquery отбрасываются: берутся только слова.
+    """
+    words = WORD_RE.findall(q.lower())
+    if not words:
+        return None
+    if dialect == "postgresql":
+        return " & ".join(f"{word}:*" for word in words)
+    return " ".join(f'"{word}"*' for word in words)
+
+async def search_tasks(q: str, limit: int = 20):
+    """Задачи, содержащие все слова запроса (как префиксы), по убыванию релевантности"""
+    dialect = database.url.dialect
+    match_query = build_match_query(q, dialect)
+    if match_query is None:
+        return []
+
+    if dialect == "postgresql":
+        ts_query = func.to_tsquery("simple", match_query)
+        query = (
+            select(*tasks.c)
+            .where(SEARCH_VECTOR.op("@@")(ts_query))
+            .order_by(func.ts_rank(SEARCH_VECTOR, ts_query).desc(), tasks.c.id)
+        )
+    else:
+        # Сначала top-N идентификаторов только по FTS-индексу, затем строки задач для них.
+        # bm25: совпадение в названии весит больше, чем в описании
+        rank = func.bm25(FTS5_TABLE, 10.0, 1.0).label("rank")
+        top = (
+            select(tasks_fts.c.rowid, rank)
+            .where(FTS5_TABLE.op("MATCH")(match_query))
+            .order_by(rank)
+            .limit(limit)
+            .subquery()
+        )
+        query = select(*tasks.c).join_from(top, tasks, tasks.c.id == top.c.rowid).order_by(top.c.rank)
+    return await database.fetch_all(query.limit(limit))
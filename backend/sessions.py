@@ -0,0 +1,96 @@
+"""Хранилище пользовательских сессий.
+
+Два бэкенда с одинаковым асинхронным интерфейсом (get / set / delete):
+- MemorySessionStore - в памяти процесса: O(1) доступ, LRU-вытеснение и TTL;
+  подходит для одного воркера и разработки;
+- DatabaseSessionStore - таблица sessions в основной БД: переживает рестарт и
+  общая для всех воркеров uvicorn.
+Выбор - переменная окружения SESSION_BACKEND (memory / database).
+"""
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import database
+from models import sessions
+
+# Совпадает с max_age cookie session_id
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "database")
+MEMORY_SESSIONS_MAX = int(os.getenv("MEMORY_SESSIONS_MAX", "10000"))
+# Просроченные строки удаляются не чаще, чем раз в столько секунд
+SESSION_PURGE_INTERVAL = 300
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class MemorySessionStore:
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS, max_entries: int = MEMORY_SESSIONS_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # session_id -> (expires_at по monotonic, данные пользователя); порядок = давность использования
+        self._entries = OrderedDict()
+
+    async def get(self, session_id: str):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[session_id]
+            return None
+        self._entries.move_to_end(session_id)
+        return user
+
+    async def set(self, session_id: str, user: dict):
+        self._entries[session_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, session_id: str):
+        self._entries.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class DatabaseSessionStore:
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._last_purge = 0.0
+
+    async def get(self, session_id: str):
+        query = sessions.select().where(sessions.c.session_id == session_id, sessions.c.expires_at > utcnow())
+        row = await database.fetch_one(query)
+        return row["user_info"] if row else None
+
+    async def set(self, session_id: str, user: dict):
+        dialect = postgresql if database.url.dialect == "postgresql" else sqlite
+        values = {"user_info": user, "expires_at": utcnow() + timedelta(seconds=self.ttl)}
+        query = dialect.insert(sessions).values(session_id=session_id, **values).on_conflict_do_update(
+            index_elements=[sessions.c.session_id], set_=values
+        )
+        await database.execute(query)
+        await self._purge_expired()
+
+    async def delete(self, session_id: str):
+        await database.execute(sessions.delete().where(sessions.c.session_id == session_id))
+
+    async def _purge_expired(self):
+        # Уборка просроченных сессий попутно с входом пользователя, без отдельного фонового процесса
+        if time.monotonic() - self._last_purge < SESSION_PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        await database.execute(sessions.delete().where(sessions.c.expires_at <= utcnow()))
+
+def create_session_store(backend: str = SESSION_BACKEND):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "database":
+        return DatabaseSessionStore()
+    raise ValueError(f"Неизвестный SESSION_BACKEND: {backend}")
+
+session_store = create_session_store()
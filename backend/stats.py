@@ -0,0 +1,357 @@
+"""Инкрементально поддерживаемая статистика задач.
+
+Счетчики по статусам хранятся в сводной таблице task_status_counts. Ее поддерживают
+триггеры на tasks, так что любая запись в tasks (эндпоинты, webhook) меняет счетчики
+в той же транзакции, а /tasks/stats читает готовые значения без сканирования всей таблицы.
+
+В Postgres триггер не обновляет строку счетчика (две транзакции, меняющие статусы в разном
+порядке, взаимно блокировались бы на строках task_status_counts), а дописывает изменение
+в task_status_deltas. Читается сумма обеих таблиц; раз в STATS_FOLD_INTERVAL секунд
+StatsFoldJob сворачивает накопленные изменения в task_status_counts - это единственный
+писатель строк счетчиков, и он блокирует их в порядке статусов.
+В SQLite запись и так идет по одной транзакции, там триггеры обновляют счетчики напрямую.
+Задачи из архива (tasks_archive, см. archive.py) учитываются наравне с tasks: перенос
+в архив вычитает задачу из счетчика триггером на tasks и добавляет триггером на архив.
+
+Лидеры по баллам берутся из user_points - суммы журнала points_ledger по логину,
+которую в той же транзакции поддерживает триггер на вставку в журнал.
+
+Проверка согласованности (запускать из backend/):
+    python stats.py check         # пересчитать с нуля и показать расхождения
+    python stats.py check --fix   # то же, плюс перестроить сводные таблицы
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from sqlalchemy import text
+
+from database import database
+from models import task_status_counts, task_status_deltas, user_points
+
+logger = logging.getLogger("stats")
+
+LEADERS_LIMIT = 5
+STATS_FOLD_INTERVAL = float(os.getenv("STATS_FOLD_INTERVAL", "5"))
+
+# Запросы "с нуля" - те же, что раньше выполнял /tasks/stats на каждый вызов;
+# {source} - tasks или tasks вместе с архивом (ALL_TASKS)
+STATUS_COUNTS_QUERY = """
+SELECT status, COUNT(*) AS count
+FROM {source}
+WHERE status IS NOT NULL
+GROUP BY status
+"""
+
+ALL_TASKS = """(
+    SELECT status FROM tasks
+    UNION ALL
+    SELECT status FROM tasks_archive
+) AS all_tasks"""
+
+# Сохраненные счетчики: свернутые значения плюс еще не свернутые изменения (одним запросом,
+# чтобы свертка между чтениями не учла изменение дважды); {condition} - отбор по сумме
+STORED_STATUS_COUNTS_QUERY = """
+SELECT status, SUM(count) AS count FROM (
+    SELECT status, count FROM task_status_counts
+    UNION ALL
+    SELECT status, delta FROM task_status_deltas
+) AS stored
+GROUP BY status
+HAVING SUM(count) {condition}
+"""
+
+# Свертка: забирает накопленные изменения и прибавляет их к счетчикам в порядке статусов
+FOLD_STATUS_DELTAS = """
+WITH moved AS (
+    DELETE FROM task_status_deltas RETURNING status, delta
+)
+INSERT INTO task_status_counts (status, count)
+SELECT status, SUM(delta) FROM moved GROUP BY status ORDER BY status
+ON CONFLICT (status) DO UPDATE SET count = task_status_counts.count + excluded.count
+RETURNING status
+"""
+
+USER_POINTS_QUERY = """
+SELECT login, SUM(delta) AS points
+FROM points_ledger
+GROUP BY login
+"""
+
+SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_stats_insert",
+    """
+    CREATE TRIGGER tasks_stats_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO task_status_counts (status, count)
+            SELECT NEW.status, 1 WHERE NEW.status IS NOT NULL
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_stats_update",
+    """
+    CREATE TRIGGER tasks_stats_update AFTER UPDATE OF status ON tasks
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE task_status_counts SET count = count - 1 WHERE status = OLD.status;
+        INSERT INTO task_status_counts (status, count)
+            SELECT NEW.status, 1 WHERE NEW.status IS NOT NULL
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_stats_delete",
+    """
+    CREATE TRIGGER tasks_stats_delete AFTER DELETE ON tasks
+    BEGIN
+        UPDATE task_status_counts SET count = count - 1 WHERE status = OLD.status;
+    END
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION tasks_stats_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF OLD.status IS NOT NULL AND (TG_OP = 'DELETE' OR OLD.status IS DISTINCT FROM NEW.status) THEN
+                INSERT INTO task_status_deltas (status, delta) VALUES (OLD.status, -1);
+            END IF;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            IF NEW.status IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM NEW.status) THEN
+                INSERT INTO task_status_deltas (status, delta) VALUES (NEW.status, 1);
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tasks_stats ON tasks",
+    """
+    CREATE TRIGGER tasks_stats AFTER INSERT OR DELETE OR UPDATE OF status ON tasks
+        FOR EACH ROW EXECUTE FUNCTION tasks_stats_apply()
+    """,
+]
+
+# Журнал баллов появился позже сводных таблиц, поэтому его триггер ставится отдельной миграцией
+LEDGER_SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS points_ledger_totals",
+    """
+    CREATE TRIGGER points_ledger_totals AFTER INSERT ON points_ledger
+    BEGIN
+        INSERT INTO user_points (login, points) VALUES (NEW.login, NEW.delta)
+            ON CONFLICT (login) DO UPDATE SET points = points + excluded.points;
+    END
+    """,
+]
+
+LEDGER_POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION points_ledger_totals() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO user_points (login, points) VALUES (NEW.login, NEW.delta)
+            ON CONFLICT (login) DO UPDATE SET points = user_points.points + excluded.points;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS points_ledger_totals ON points_ledger",
+    """
+    CREATE TRIGGER points_ledger_totals AFTER INSERT ON points_ledger
+        FOR EACH ROW EXECUTE FUNCTION points_ledger_totals()
+    """,
+]
+
+# Архив появился позже: его триггеры ставит отдельная миграция. Строки архива только
+# добавляются и удаляются, поэтому UPDATE не отслеживается
+ARCHIVE_SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_archive_stats_insert",
+    """
+    CREATE TRIGGER tasks_archive_stats_insert AFTER INSERT ON tasks_archive
+    BEGIN
+        INSERT INTO task_status_counts (status, count)
+            SELECT NEW.status, 1 WHERE NEW.status IS NOT NULL
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_archive_stats_delete",
+    """
+    CREATE TRIGGER tasks_archive_stats_delete AFTER DELETE ON tasks_archive
+    BEGIN
+        UPDATE task_status_counts SET count = count - 1 WHERE status = OLD.status;
+    END
+    """,
+]
+
+# Функция tasks_stats_apply работает только с NEW/OLD и подходит для архива без изменений
+ARCHIVE_POSTGRES_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_archive_stats ON tasks_archive",
+    """
+    CREATE TRIGGER tasks_archive_stats AFTER INSERT OR DELETE ON tasks_archive
+        FOR EACH ROW EXECUTE FUNCTION tasks_stats_apply()
+    """,
+]
+
+def install_stats_triggers(connection):
+    """Создает (пересоздает) триггеры, поддерживающие сводные таблицы"""
+    statements = POSTGRES_TRIGGERS if connection.dialect.name == "postgresql" else SQLITE_TRIGGERS
+    for statement in statements:
+        connection.execute(text(statement))
+
+def install_ledger_triggers(connection):
+    """Создает (пересоздает) триггер, поддерживающий user_points"""
+    statements = LEDGER_POSTGRES_TRIGGERS if connection.dialect.name == "postgresql" else LEDGER_SQLITE_TRIGGERS
+    for statement in statements:
+        connection.execute(text(statement))
+
+def install_archive_stats_triggers(connection):
+    """Создает (пересоздает) триггеры, учитывающие архив в сводных таблицах"""
+    statements = ARCHIVE_POSTGRES_TRIGGERS if connection.dialect.name == "postgresql" else ARCHIVE_SQLITE_TRIGGERS
+    for statement in statements:
+        connection.execute(text(statement))
+
+def backfill_stats(connection):
+    """Заполняет сводные таблицы по текущему содержимому tasks (синхронно, для миграции 3 -
+    архива тогда еще нет)"""
+    connection.execute(task_status_counts.delete())
+    connection.execute(text(f"INSERT INTO task_status_counts (status, count) {STATUS_COUNTS_QUERY.format(source='tasks')}"))
+
+def backfill_user_points(connection):
+    """Заполняет user_points по журналу баллов (синхронно, для миграций)"""
+    connection.execute(user_points.delete())
+    connection.execute(text(f"INSERT INTO user_points (login, points) {USER_POINTS_QUERY}"))
+
+async def compute_stats_from_scratch():
+    """Пересчитывает статистику полным сканированием tasks и архива"""
+    statuses = {
+        row["status"]: row["count"]
+        for row in await database.fetch_all(STATUS_COUNTS_QUERY.format(source=ALL_TASKS))
+    }
+    users = {row["login"]: row["points"] for row in await database.fetch_all(USER_POINTS_QUERY)}
+    return statuses, users
+
+async def load_stored_stats():
+    """Читает текущее содержимое сводных таблиц (без нулевых строк)"""
+    status_rows = await database.fetch_all(STORED_STATUS_COUNTS_QUERY.format(condition="!= 0"))
+    user_rows = await database.fetch_all(user_points.select())
+    statuses = {row["status"]: row["count"] for row in status_rows}
+    users = {row["login"]: row["points"] for row in user_rows}
+    return statuses, users
+
+async def read_stats(leaders_limit: int = LEADERS_LIMIT):
+    """Статистика для /tasks/stats: чтение из сводных таблиц"""
+    status_rows = await database.fetch_all(STORED_STATUS_COUNTS_QUERY.format(condition="> 0"))
+    # Индекс по user_points.points: top-N читается без сортировки всей таблицы
+    leader_rows = await database.fetch_all(
+        user_points.select()
+        .order_by(user_points.c.points.desc(), user_points.c.login)
+        .limit(leaders_limit)
+    )
+    return {
+        "statuses": {row["status"]: row["count"] for row in status_rows},
+        "points_leaders": [
+            {"assignee": row["login"], "points": row["points"]} for row in leader_rows
+        ],
+    }
+
+async def rebuild_stats():
+    """Перестраивает сводные таблицы с нуля в одной транзакции"""
+    async with database.transaction():
+        await database.execute(task_status_counts.delete())
+        await database.execute(task_status_deltas.delete())
+        await database.execute(user_points.delete())
+        statuses, users = await compute_stats_from_scratch()
+        if statuses:
+            await database.execute_many(
+                task_status_counts.insert(),
+                [{"status": status, "count": count} for status, count in statuses.items()],
+            )
+        if users:
+            await database.execute(
+                user_points.insert().values([{"login": login, "points": total} for login, total in users.items()])
+            )
+    logger.info(
+        "Сводная статистика перестроена: %d статусов, %d пользователей",
+        len(statuses), len(users),
+    )
+
+async def fold_status_deltas() -> int:
+    """Переносит накопленные изменения счетчиков в task_status_counts (Postgres);
+    возвращает число затронутых статусов"""
+    if database.url.dialect != "postgresql":
+        return 0
+    return len(await database.fetch_all(FOLD_STATUS_DELTAS))
+
+class StatsFoldJob:
+    """Периодическая свертка task_status_deltas внутри процесса приложения"""
+
+    def __init__(self, interval: float = STATS_FOLD_INTERVAL):
+        self._interval = interval
+        self._task = None
+
+    async def start(self):
+        if self._interval > 0 and database.url.dialect == "postgresql":
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await fold_status_deltas()
+            except Exception:
+                logger.exception("Stats fold job failed")
+            await asyncio.sleep(self._interval)
+
+stats_fold_job = StatsFoldJob()
+
+def diff_stats(expected, actual):
+    """Список расхождений между пересчитанной и сохраненной статистикой"""
+    drift = []
+    for name, expected_part, actual_part in zip(("status", "user"), expected, actual):
+        for key in sorted(set(expected_part) | set(actual_part), key=str):
+            if expected_part.get(key) != actual_part.get(key):
+                drift.append(f"{name} {key!r}: ожидалось {expected_part.get(key)}, в сводной таблице {actual_part.get(key)}")
+    return drift
+
+async def check_stats(fix: bool = False):
+    """Сверяет сводные таблицы с пересчетом с нуля; при fix=True перестраивает их"""
+    async with database.transaction():
+        expected = await compute_stats_from_scratch()
+        actual = await load_stored_stats()
+    drift = diff_stats(expected, actual)
+    if drift and fix:
+        await rebuild_stats()
+    return drift
+
+async def _main(argv):
+    parser = argparse.ArgumentParser(description="Проверка сводной статистики задач")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    check_parser = subcommands.add_parser("check", help="сверить сводные таблицы с пересчетом с нуля")
+    check_parser.add_argument("--fix", action="store_true", help="перестроить сводные таблицы при расхождении")
+    args = parser.parse_args(argv)
+
+    await database.connect()
+    try:
+        drift = await check_stats(fix=args.fix)
+    finally:
+        await database.disconnect()
+
+    if not drift:
+        print("Сводная статистика согласована")
+        return 0
+    print(f"Найдено расхождений: {len(drift)}")
+    for line in drift:
+        print(f"  {line}")
+    if args.fix:
+        print("Сводные таблицы перестроены")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
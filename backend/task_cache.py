@@ -0,0 +1,195 @@
+"""Кэш ответов GET /tasks/{id} в памяти процесса.
+
+Хранит готовые байты TaskOut и ETag по ID задачи (LRU, не больше TASK_CACHE_SIZE записей),
+поэтому повторное чтение задачи не ходит в БД и не сериализует строку заново.
+Запись сбрасывается при каждой мутации задачи в task_repository (эндпоинты, bulk,
+обработчики webhook, replay.py), TASK_CACHE_TTL ограничивает жизнь записи на случай
+записи в обход репозитория (ручной SQL).
+
+Поколение защищает от гонки чтения с записью: строка, прочитанная до сброса,
+в кэш уже не попадет (см. generation/put).
+
+При нескольких воркерах uvicorn у каждого свой кэш. TASK_CACHE_CHANNEL_DIR - общая
+директория, через которую процессы рассылают друг другу сбросы (Unix datagram-сокет
+на процесс, сообщение - ID задач через запятую). Без нее при нескольких воркерах
+изменение из другого воркера видно только через TASK_CACHE_TTL.
+
+Настройка:
+    TASK_CACHE_SIZE=1000          - записей в кэше (0 - кэш выключен)
+    TASK_CACHE_TTL=30             - секунд жизни записи
+    TASK_CACHE_CHANNEL_DIR=/run/task-cache - директория для сбросов между процессами
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+
+from metrics import CallbackGauge, Counter, register
+
+logger = logging.getLogger("task_cache")
+
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "1000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "30"))
+TASK_CACHE_CHANNEL_DIR = os.getenv("TASK_CACHE_CHANNEL_DIR", "")
+
+# Столько ID в одном сообщении канала (с запасом меньше размера датаграммы)
+CHANNEL_IDS_PER_MESSAGE = 1000
+CHANNEL_MESSAGE_MAX = 64 * 1024
+
+cache_requests = register(Counter("task_cache_requests_total", "Чтения кэша задач", ["result"]))
+cache_invalidations = register(Counter("task_cache_invalidations_total", "Сброшенные записи кэша задач"))
+
+class InvalidationChannel:
+    """Рассылка ID измененных задач другим процессам через Unix datagram-сокеты в directory"""
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._path = None
+        self._receiver = None
+        self._sender = None
+
+    def start(self, on_message):
+        # PID берется при запуске: модуль мог быть импортирован до fork воркеров
+        self._path = os.path.join(self._directory, f"{os.getpid()}.sock")
+        os.makedirs(self._directory, exist_ok=True)
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(self._path)
+        receiver.setblocking(False)
+        asyncio.get_running_loop().add_reader(receiver.fileno(), self._read, receiver, on_message)
+        self._receiver = receiver
+
+    def stop(self):
+        if self._receiver is not None:
+            asyncio.get_running_loop().remove_reader(self._receiver.fileno())
+            self._receiver.close()
+            self._receiver = None
+            if os.path.exists(self._path):
+                os.unlink(self._path)
+            self._path = None
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+
+    def _read(self, receiver, on_message):
+        while True:
+            try:
+                message = receiver.recv(CHANNEL_MESSAGE_MAX)
+            except BlockingIOError:
+                return
+            try:
+                on_message([int(task_id) for task_id in message.split(b",")])
+            except ValueError:
+                logger.warning("Invalid task cache message: %r", message[:100])
+
+    def send(self, task_ids):
+        """Отправляет ID всем остальным процессам (в том числе из CLI, которые сами не слушают);
+        недоставленное сообщение теряется, запись доживает до TTL"""
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return
+        messages = [
+            ",".join(str(task_id) for task_id in task_ids[start:start + CHANNEL_IDS_PER_MESSAGE]).encode()
+            for start in range(0, len(task_ids), CHANNEL_IDS_PER_MESSAGE)
+        ]
+        for name in names:
+            path = os.path.join(self._directory, name)
+            if not name.endswith(".sock") or path == self._path:
+                continue
+            try:
+                for message in messages:
+                    self._sender.sendto(message, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Процесс завершился, не убрав сокет
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except (BlockingIOError, OSError) as exc:
+                logger.warning("Task cache invalidation to %s dropped: %s", name, exc)
+
+class TaskCache:
+    def __init__(self, max_entries: int = TASK_CACHE_SIZE, ttl: float = TASK_CACHE_TTL, channel_dir: str = TASK_CACHE_CHANNEL_DIR):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # task_id -> (expires_at по monotonic, байты TaskOut, ETag); порядок = давность использования
+        self._entries = OrderedDict()
+        self._generation = 0
+        self.hits = self.misses = 0
+        self._channel = InvalidationChannel(channel_dir) if channel_dir else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def generation(self) -> int:
+        """Снимок до чтения из БД: put с устаревшим поколением ничего не сохраняет"""
+        return self._generation
+
+    def get(self, task_id: int):
+        """(байты, ETag) или None"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(task_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[task_id]
+            self.misses += 1
+            cache_requests.inc("miss")
+            return None
+        self._entries.move_to_end(task_id)
+        self.hits += 1
+        cache_requests.inc("hit")
+        return entry[1], entry[2]
+
+    def put(self, task_id: int, body: bytes, etag: str, generation: int):
+        # После снимка прошел сброс: прочитанная строка могла устареть
+        if not self.enabled or generation != self._generation:
+            return
+        self._entries[task_id] = (time.monotonic() + self.ttl, body, etag)
+        self._entries.move_to_end(task_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _drop(self, task_ids):
+        self._generation += 1
+        for task_id in task_ids:
+            if self._entries.pop(task_id, None) is not None:
+                cache_invalidations.inc()
+
+    def invalidate(self, task_ids):
+        """Сбрасывает записи задач в этом процессе и рассылает сброс остальным"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+        self._drop(task_ids)
+        if self._channel is not None:
+            self._channel.send(task_ids)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def start(self):
+        if self.enabled and self._channel is not None:
+            self._channel.start(self._drop)
+
+    async def stop(self):
+        if self._channel is not None:
+            self._channel.stop()
+
+    def __len__(self):
+        return len(self._entries)
+
+task_cache = TaskCache()
+
+register(CallbackGauge("task_cache_entries", "Записей в кэше задач", lambda: len(task_cache)))
+register(CallbackGauge("task_cache_hit_ratio", "Доля попаданий в кэш задач", task_cache.hit_ratio))
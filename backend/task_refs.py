@@ -0,0 +1,122 @@
+"""Поиск ссылок на задачи в коммитах, ветках и описаниях PR.
+
+Все префиксы и ключевые слова собраны в одно заранее скомпилированное регулярное
+выражение, поэтому текст любой длины просматривается за один проход, и находятся
+все ссылки, а не только первая: "TASK-12, TASK-15" - это две задачи.
+
+Ключевое слово перед ссылкой ("fixes TASK-1", "Closes [TASK-2]") помечает ее как
+закрывающую. Оно распространяется на перечисление: "fixes TASK-1, TASK-2 and TASK-3".
+Ссылка может быть концом URL трекера: "fixes https://tracker.example.com/browse/TASK-4"
+закрывает TASK-4 (ключевое слово ищется перед URL).
+
+Настройка через переменные окружения (значения через запятую):
+    TASK_REF_PREFIXES=TASK,BUG            - префиксы ID задач
+    TASK_CLOSE_KEYWORDS=fixes,closes,...  - закрывающие ключевые слова
+    PROTECTED_BRANCHES=main,master        - merge PR в эти ветки закрывает задачи
+    PR_CLOSE_REQUIRES_KEYWORD=false       - true: описание PR закрывает только ссылки с ключевым словом
+"""
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+def env_list(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+TASK_REF_PREFIXES = env_list("TASK_REF_PREFIXES", "TASK")
+TASK_CLOSE_KEYWORDS = env_list(
+    "TASK_CLOSE_KEYWORDS", "close,closes,closed,fix,fixes,fixed,resolve,resolves,resolved"
+)
+PROTECTED_BRANCHES = env_list("PROTECTED_BRANCHES", "main,master")
+PR_CLOSE_REQUIRES_KEYWORD = os.getenv("PR_CLOSE_REQUIRES_KEYWORD", "false").lower() in ("1", "true", "yes")
+
+# Между ссылками перечисления после ключевого слова: запятые, "and", "&", скобки
+LIST_GAP = re.compile(r"[\s,\])]*(?:(?:and|&)\s*)?[\[(#]?\s*", re.IGNORECASE)
+
+# ID задачи - INTEGER (до 2^31 - 1): девяти цифр хватает с запасом
+MAX_TASK_ID_DIGITS = 9
+
+class TaskRef(NamedTuple):
+    task_id: int
+    closing: bool
+
+# Что может стоять между ключевым словом и ссылкой: "Fixes: [TASK-1]", "closes #TASK-2"
+KEYWORD_SEPARATORS = " \t\r\n:[(#"
+
+# URL, которым заканчивается текст перед ссылкой: "https://tracker.example.com/browse/" + TASK-4
+URL_BEFORE_REF = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://[^\s\[\]()<>]*/\Z")
+URL_WINDOW = 2048
+
+class TaskRefMatcher:
+    def __init__(self, prefixes=None, close_keywords=None):
+        prefixes = prefixes if prefixes is not None else TASK_REF_PREFIXES
+        close_keywords = close_keywords if close_keywords is not None else TASK_CLOSE_KEYWORDS
+        # Выражение начинается с литерала "-": re ищет его быстрым поиском подстроки, а префикс
+        # проверяет lookbehind (свой на каждый префикс - в Python он должен быть фиксированной длины).
+        # Шаблон вида (?i)TASK-\d+ с lookbehind в начале проверяется на каждой позиции и в ~20 раз медленнее.
+        # Префикс не должен быть хвостом другого слова: SUBTASK-1 - не ссылка на TASK-1
+        prefix_checks = "|".join(rf"(?<=(?<![A-Za-z0-9])(?i:{re.escape(prefix)})-)" for prefix in prefixes)
+        # Не больше MAX_TASK_ID_DIGITS цифр: более длинное число - не ссылка (иначе ID не влезет
+        # в INTEGER, и запрос с ним уронит обработку всей доставки вместе с корректными ссылками)
+        self._pattern = re.compile(rf"-(?:{prefix_checks})(\d{{1,{MAX_TASK_ID_DIGITS}}})(?!\d)")
+        self._prefixes = sorted((prefix.lower() for prefix in prefixes), key=len, reverse=True)
+        # Длинные варианты раньше коротких: "closes" не должно совпасть как "close"
+        self._keywords = tuple(sorted((keyword.lower() for keyword in close_keywords), key=len, reverse=True))
+        self._keyword_window = max((len(keyword) for keyword in self._keywords), default=0) + 16
+
+    def _ref_start(self, text: str, dash: int) -> int:
+        """Начало ссылки, у которой "-" стоит в позиции dash (совпадение уже проверено lookbehind)"""
+        for prefix in self._prefixes:
+            if text[dash - len(prefix):dash].lower() == prefix:
+                return dash - len(prefix)
+        return dash
+
+    def _url_start(self, text: str, start: int) -> int:
+        """Начало URL, частью которого является ссылка, иначе start"""
+        if start == 0 or text[start - 1] != "/":
+            return start
+        url = URL_BEFORE_REF.search(text, max(0, start - URL_WINDOW), start)
+        return url.start() if url else start
+
+    def _has_keyword(self, text: str, start: int) -> bool:
+        """Стоит ли перед позицией start закрывающее ключевое слово"""
+        head = text[max(0, start - self._keyword_window):start].rstrip(KEYWORD_SEPARATORS).lower()
+        if not head.endswith(self._keywords):
+            return False
+        for keyword in self._keywords:
+            if head.endswith(keyword):
+                # Слово целиком: "prefixes TASK-1" не содержит ключевого слова "fixes"
+                return len(head) == len(keyword) or not head[-len(keyword) - 1].isalnum()
+        return False
+
+    def refs(self, text: str) -> List[TaskRef]:
+        """Все ссылки в порядке первого упоминания; закрывающая, если хоть раз была с ключевым словом"""
+        found = {}
+        closing_list, previous_end = False, 0
+        text = text or ""
+        for match in self._pattern.finditer(text):
+            start = self._url_start(text, self._ref_start(text, match.start()))
+            # Ссылка продолжает перечисление после ключевого слова или сама стоит после него
+            in_list = closing_list and LIST_GAP.fullmatch(text, previous_end, start)
+            if self._keywords and not in_list:
+                closing_list = self._has_keyword(text, start)
+            previous_end = match.end()
+            task_id = int(match.group(1))
+            found[task_id] = found.get(task_id, False) or closing_list
+        return [TaskRef(task_id, closing) for task_id, closing in found.items()]
+
+    def find_all(self, text: str) -> List[int]:
+        """ID всех упомянутых задач без повторов (без разбора ключевых слов - один findall)"""
+        return list(dict.fromkeys(int(task_id) for task_id in self._pattern.findall(text or "")))
+
+    def closing_ids(self, text: str) -> List[int]:
+        """ID задач, упомянутых с закрывающим ключевым словом"""
+        return [ref.task_id for ref in self.refs(text) if ref.closing]
+
+    def first(self, text: str) -> Optional[int]:
+        match = self._pattern.search(text or "")
+        return int(match.group(1)) if match else None
+
+def is_protected_branch(branch: str) -> bool:
+    return branch in PROTECTED_BRANCHES
+
+task_ref_matcher = TaskRefMatcher()
@@ -0,0 +1,396 @@
+"""Слой доступа к задачам: каждая мутация - один SQL-оператор.
+
+Все изменения выполняются через UPDATE/INSERT/DELETE ... RETURNING, поэтому вызывающему
+коду не нужно заранее читать строку и перечитывать ее после записи. Отсутствие задачи
+определяется по пустому RETURNING (None / False).
+RETURNING поддерживают и SQLite (3.35+), и Postgres.
+
+Баллы начисляются только записью в points_ledger с ключом идемпотентности; tasks.points -
+сумма начислений по задаче, она растет в той же транзакции, что и вставка в журнал.
+Бонус за закрытие имеет ключ close:{task_id}, поэтому задача получает его один раз,
+каким бы путем ее ни закрыли (PATCH, bulk, merge PR, повторная доставка webhook).
+Каждая успешная мутация публикует событие в events.event_bus (поток /tasks/events)
+и сбрасывает запись задачи в task_cache (кэш GET /tasks/{id}).
+
+Запись статуса ставит tasks.closed_at (время закрытия, по нему archive.py переносит задачи
+в tasks_archive). Архивные задачи только читаются (get_archived) и удаляются.
+"""
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, Integer, String, case, cast, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import database
+from events import publish_task_created, publish_task_updated, publish_task_deleted, publish_tasks_archived
+from models import tasks, tasks_archive, task_members, points_ledger
+from task_cache import task_cache
+
+# JSON-колонка задачи -> роль в task_members
+MEMBER_COLUMNS = {"reviewers": "reviewer", "watchers": "watcher"}
+
+# Строк task_members в одном INSERT: 3 параметра на строку, старые сборки SQLite
+# ограничивают запрос 999 параметрами
+MEMBER_INSERT_CHUNK = 300
+
+# Баллы за закрытие задачи
+CLOSE_BONUS_POINTS = 10
+CLOSED_STATUS = "closed"
+
+# Кому начисляются баллы задачи: ответственный за ветку, иначе исполнитель
+points_login = func.coalesce(tasks.c.branch_assignee_github_login, tasks.c.assignee)
+
+async def get(task_id: int):
+    """Задача по ID или None"""
+    return await database.fetch_one(tasks.select().where(tasks.c.id == task_id))
+
+async def get_archived(task_id: int):
+    """Задача из архива по ID или None"""
+    return await database.fetch_one(tasks_archive.select().where(tasks_archive.c.id == task_id))
+
+def member_rows(task_id: int, values: dict):
+    """Строки task_members для ревьюеров/наблюдателей из values (только переданные колонки)"""
+    rows = []
+    for column, role in MEMBER_COLUMNS.items():
+        for login in dict.fromkeys(values.get(column) or []):
+            rows.append({"task_id": task_id, "role": role, "login": login})
+    return rows
+
+async def insert_members(rows):
+    """Вставляет строки task_members пачками по MEMBER_INSERT_CHUNK"""
+    for start in range(0, len(rows), MEMBER_INSERT_CHUNK):
+        await database.execute(task_members.insert().values(rows[start:start + MEMBER_INSERT_CHUNK]))
+
+async def replace_members(task_id: int, values: dict):
+    """Перезаписывает участников задачи для ролей, колонки которых есть в values"""
+    await replace_members_many([task_id], values)
+
+async def replace_members_many(task_ids, values: dict):
+    """То же для нескольких задач с одинаковыми values: один DELETE и один INSERT"""
+    roles = [role for column, role in MEMBER_COLUMNS.items() if column in values]
+    if not roles or not task_ids:
+        return
+    await database.execute(
+        task_members.delete().where(task_members.c.task_id.in_(task_ids), task_members.c.role.in_(roles))
+    )
+    await insert_members([member for task_id in task_ids for member in member_rows(task_id, values)])
+
+async def insert(values: dict):
+    """Создает задачу (вместе с участниками) и возвращает ее строку"""
+    query = tasks.insert().values(**values).returning(*tasks.c)
+    async with database.transaction():
+        task = await database.fetch_one(query)
+        await replace_members(task["id"], values)
+    # Кэш не должен отдать под новым id чужой ответ, даже если id когда-то уже был выдан
+    task_cache.invalidate([task["id"]])
+    publish_task_created(task)
+    return task
+
+async def insert_many(values_list):
+    """Создает задачи одним многострочным INSERT ... RETURNING в одной транзакции.
+
+    Возвращает строки в порядке values_list: id выдаются по порядку VALUES,
+    а порядок строк в RETURNING не гарантирован, поэтому сопоставляем по сортировке id.
+    """
+    if not values_list:
+        return []
+    columns = list(dict.fromkeys(column for values in values_list for column in values))
+    rows = [{column: values.get(column) for column in columns} for values in values_list]
+    async with database.transaction():
+        created = await database.fetch_all(tasks.insert().values(rows).returning(*tasks.c))
+        created = sorted(created, key=lambda task: task["id"])
+        await insert_members([
+            member
+            for task, values in zip(created, values_list)
+            for member in member_rows(task["id"], values)
+        ])
+    task_cache.invalidate(task["id"] for task in created)
+    for task in created:
+        publish_task_created(task)
+    return created
+
+def publish_changes(task, columns):
+    """Событие с новыми значениями перечисленных колонок обновленной строки"""
+    if task:
+        task_cache.invalidate([task["id"]])
+        publish_task_updated(task["id"], {column: task[column] for column in columns})
+    return task
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def insert_ignore_duplicates(table):
+    dialect = postgresql if database.url.dialect == "postgresql" else sqlite
+    return dialect.insert(table).on_conflict_do_nothing()
+
+async def award(condition, delta: int, reason: str, key, delivery_id: str = None):
+    """Начисляет delta задачам по условию condition через журнал баллов.
+
+    key - SQL-выражение ключа идемпотентности строки журнала. Задачи без получателя
+    и уже начисленные ключи пропускаются. Вызывать внутри транзакции.
+    Возвращает {task_id: новая строка} для задач, которым баллы действительно начислены.
+    """
+    source = select(
+        points_login,
+        tasks.c.id,
+        literal(delta, Integer),
+        literal(reason, String),
+        literal(delivery_id, String),
+        literal(utcnow(), DateTime),
+        key,
+    ).where(condition, points_login.is_not(None))
+    query = insert_ignore_duplicates(points_ledger).from_select(
+        ["login", "task_id", "delta", "reason", "delivery_id", "created_at", "idempotency_key"], source
+    ).returning(points_ledger.c.task_id)
+    awarded = [row["task_id"] for row in await database.fetch_all(query)]
+    if not awarded:
+        return {}
+    query = (
+        tasks.update()
+        .where(tasks.c.id.in_(awarded))
+        .values(points=func.coalesce(tasks.c.points, 0) + delta, version=tasks.c.version + 1)
+        .returning(*tasks.c)
+    )
+    return {task["id"]: task for task in await database.fetch_all(query)}
+
+async def award_close_bonus(task_ids, delivery_id: str = None):
+    """Бонус за закрытие задачам из task_ids, которые сейчас закрыты (внутри транзакции).
+    Ключ close:{id} однозначен, пока id задач не выдаются повторно (миграция 1)"""
+    if not task_ids:
+        return {}
+    return await award(
+        tasks.c.id.in_(list(task_ids)) & (tasks.c.status == CLOSED_STATUS),
+        CLOSE_BONUS_POINTS,
+        "close",
+        literal("close:") + cast(tasks.c.id, String),
+        delivery_id,
+    )
+
+async def award_points(task_id: int, delta: int, reason: str, idempotency_key: str, delivery_id: str = None):
+    """Начисляет баллы задаче один раз на idempotency_key.
+
+    Возвращает новую строку или None, если задачи нет, получатель не назначен
+    или начисление с таким ключом уже было.
+    """
+    async with database.transaction():
+        awarded = await award(tasks.c.id == task_id, delta, reason, literal(idempotency_key, String), delivery_id)
+    return publish_changes(awarded.get(task_id), ["points"])
+
+def closed_at_value(status: str):
+    """Значение closed_at при записи статуса: повторное закрытие не сдвигает время закрытия,
+    любой другой статус его сбрасывает"""
+    if status != CLOSED_STATUS:
+        return None
+    now = literal(utcnow(), DateTime)
+    return case((tasks.c.status == CLOSED_STATUS, func.coalesce(tasks.c.closed_at, now)), else_=now)
+
+def update_query(task_ids, values: dict):
+    """UPDATE ... RETURNING задач task_ids (ID или список ID) и итоговый набор колонок (с версией)"""
+    values = dict(values, version=tasks.c.version + 1)
+    condition = tasks.c.id.in_(task_ids) if isinstance(task_ids, list) else tasks.c.id == task_ids
+    query = tasks.update().where(condition).values(**values)
+    # closed_at служебная: пишется вместе со статусом, но в события не попадает
+    if "status" in values:
+        query = query.values(closed_at=closed_at_value(values["status"]))
+    return values, query.returning(*tasks.c)
+
+async def update(task_id: int, values: dict):
+    """Обновляет поля задачи; возвращает новую строку или None, если задачи нет.
+
+    При переводе в 'closed' начисляет CLOSE_BONUS_POINTS (однократно для задачи).
+    """
+    if not values:
+        return await get(task_id)
+
+    closing = values.get("status") == CLOSED_STATUS
+    values, query = update_query(task_id, values)
+    if not closing and not any(column in values for column in MEMBER_COLUMNS):
+        return publish_changes(await database.fetch_one(query), values)
+
+    # Участники и бонус меняются в той же транзакции, что и сама задача
+    async with database.transaction():
+        task = await database.fetch_one(query)
+        if task:
+            await replace_members(task_id, values)
+            if closing:
+                task = (await award_close_bonus([task_id])).get(task_id, task)
+    return publish_changes(task, [*values, "points"] if closing else values)
+
+async def update_many(items):
+    """Обновляет несколько задач [(task_id, values)] в одной транзакции.
+
+    Задачи с одинаковым набором изменений обновляются одним UPDATE ... WHERE id IN (...)
+    (типично для планирования: перевести десятки задач в один статус).
+    Возвращает список новых строк (None для отсутствующих задач) в порядке items.
+    """
+    task_ids = [task_id for task_id, _ in items]
+    if len(set(task_ids)) == len(task_ids):
+        groups = {}
+        for task_id, values in items:
+            key = json.dumps(values, sort_keys=True, default=str)
+            groups.setdefault(key, (values, []))[1].append(task_id)
+        groups = list(groups.values())
+    else:
+        # Повторяющиеся ID применяются строго по порядку, по одному
+        groups = [(values, [task_id]) for task_id, values in items]
+
+    rows, changes = {}, []
+    async with database.transaction():
+        for values, ids in groups:
+            if not values:
+                for task in await database.fetch_all(tasks.select().where(tasks.c.id.in_(ids))):
+                    rows[task["id"]] = task
+                continue
+            closing = values.get("status") == CLOSED_STATUS
+            values, query = update_query(ids, values)
+            updated = await database.fetch_all(query)
+            updated_ids = [task["id"] for task in updated]
+            await replace_members_many(updated_ids, values)
+            awarded = await award_close_bonus(updated_ids) if closing else {}
+            columns = [*values, "points"] if closing else list(values)
+            for task in updated:
+                task = awarded.get(task["id"], task)
+                rows[task["id"]] = task
+                changes.append((task, columns))
+    # События - только после фиксации транзакции
+    for task, columns in changes:
+        publish_changes(task, columns)
+    return [rows.get(task_id) for task_id in task_ids]
+
+async def assign_branch(task_id: int, github_login: str):
+    """Назначает ответственного за ветку (он же становится assignee)"""
+    return await update(task_id, {
+        "branch_assignee_github_login": github_login,
+        "assignee": github_login,
+    })
+
+async def delete(task_id: int) -> bool:
+    """Удаляет задачу (или архивную задачу) вместе с ее участниками; False, если задачи не было"""
+    query = tasks.delete().where(tasks.c.id == task_id).returning(tasks.c.id)
+    archive_query = tasks_archive.delete().where(tasks_archive.c.id == task_id).returning(tasks_archive.c.id)
+    async with database.transaction():
+        # Не полагаемся на ON DELETE CASCADE: в SQLite внешние ключи выключены по умолчанию
+        await database.execute(task_members.delete().where(task_members.c.task_id == task_id))
+        deleted = await database.fetch_one(query) is not None
+        if not deleted:
+            deleted = await database.fetch_one(archive_query) is not None
+    if deleted:
+        task_cache.invalidate([task_id])
+        publish_task_deleted(task_id)
+    return deleted
+
+async def stamp_closed_at():
+    """closed_at для закрытых задач без него (закрыты в обход репозитория, например ручным SQL)"""
+    query = (
+        tasks.update()
+        .where(tasks.c.status == CLOSED_STATUS, tasks.c.closed_at.is_(None))
+        .values(closed_at=utcnow(), version=tasks.c.version + 1)
+        .returning(tasks.c.id)
+    )
+    # Версия в ETag меняется, поэтому закэшированный ответ тоже сбрасываем
+    task_cache.invalidate(row["id"] for row in await database.fetch_all(query))
+
+async def archive_closed(closed_before: datetime, limit: int):
+    """Переносит в tasks_archive до limit задач, закрытых раньше closed_before; возвращает их ID.
+
+    DELETE ... RETURNING и INSERT в одной транзакции: в архив попадают ровно удаленные строки,
+    даже если задачу успели переоткрыть между отбором и удалением.
+    Участники (task_members) остаются: по ним фильтруется список с include_archived.
+    """
+    candidates = (
+        select(tasks.c.id)
+        .where(tasks.c.status == CLOSED_STATUS, tasks.c.closed_at < closed_before)
+        .order_by(tasks.c.id)
+        .limit(limit)
+    )
+    query = (
+        tasks.delete()
+        .where(tasks.c.id.in_(candidates), tasks.c.status == CLOSED_STATUS)
+        .returning(*tasks.c)
+    )
+    archived_at = utcnow()
+    async with database.transaction():
+        rows = await database.fetch_all(query)
+        if rows:
+            await database.execute(tasks_archive.insert().values([
+                {**{column.name: row[column.name] for column in tasks.columns}, "archived_at": archived_at}
+                for row in rows
+            ]))
+    task_ids = sorted(row["id"] for row in rows)
+    if task_ids:
+        # Ответ архивной задачи совпадает с прежним, но кэш не полагается на это
+        task_cache.invalidate(task_ids)
+        publish_tasks_archived(task_ids)
+    return task_ids
+
+async def has_member(task_id: int, login: str, role: str) -> bool:
+    """Является ли login участником задачи в роли role (поиск по первичному ключу)"""
+    query = select(task_members.c.task_id).where(
+        task_members.c.task_id == task_id,
+        task_members.c.role == role,
+        task_members.c.login == login,
+    )
+    return await database.fetch_one(query) is not None
+
+def member_task_ids(login: str, role: str = None):
+    """Подзапрос ID задач, где login - участник (в роли role, если задана)"""
+    query = select(task_members.c.task_id).where(task_members.c.login == login)
+    if role is not None:
+        query = query.where(task_members.c.role == role)
+    return query
+
+async def set_status(task_id: int, status: str, delivery_id: str = None):
+    """Меняет статус задачи; возвращает новую строку или None.
+
+    delivery_id - доставка webhook, которая закрыла задачу (пишется в журнал баллов).
+    """
+    query = (
+        tasks.update()
+        .where(tasks.c.id == task_id)
+        .values(status=status, closed_at=closed_at_value(status), version=tasks.c.version + 1)
+        .returning(*tasks.c)
+    )
+    if status != CLOSED_STATUS:
+        return publish_changes(await database.fetch_one(query), ["status"])
+    async with database.transaction():
+        task = await database.fetch_one(query)
+        if task:
+            task = (await award_close_bonus([task_id], delivery_id)).get(task_id, task)
+    return publish_changes(task, ["status", "points"])
+
+async def set_status_many(task_ids, status: str, branch_name: str = None, delivery_id: str = None):
+    """Меняет статус сразу у нескольких задач (опционально только привязанных к ветке).
+
+    Возвращает ID задач, которые действительно были обновлены.
+    """
+    query = tasks.update().where(tasks.c.id.in_(task_ids))
+    if branch_name is not None:
+        query = query.where(tasks.c.branch_name == branch_name)
+    query = query.values(status=status, closed_at=closed_at_value(status), version=tasks.c.version + 1).returning(tasks.c.id)
+    if status != CLOSED_STATUS:
+        updated_ids = {row["id"] for row in await database.fetch_all(query)}
+        task_cache.invalidate(updated_ids)
+        for task_id in updated_ids:
+            publish_task_updated(task_id, {"status": status})
+        return updated_ids
+
+    async with database.transaction():
+        updated_ids = {row["id"] for row in await database.fetch_all(query)}
+        awarded = await award_close_bonus(updated_ids, delivery_id)
+    task_cache.invalidate(updated_ids)
+    for task_id in updated_ids:
+        if task_id in awarded:
+            publish_task_updated(task_id, {"status": status, "points": awarded[task_id]["points"]})
+        else:
+            publish_task_updated(task_id, {"status": status})
+    return updated_ids
+
+async def link_branch(task_id: int, branch_name: str):
+    """Привязывает ветку к задаче, если ветка еще не привязана"""
+    query = (
+        tasks.update()
+        .where(tasks.c.id == task_id, tasks.c.branch_name.is_(None))
+        .values(branch_name=branch_name, version=tasks.c.version + 1)
+        .returning(*tasks.c)
+    )
+    return publish_changes(await database.fetch_one(query), ["branch_name"])
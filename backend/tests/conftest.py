@@ -0,0 +1,83 @@
+"""Общие фикстуры тестов backend.
+
+Запуск из backend/:
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# До импорта приложения: своя временная БД и рабочая директория (uploads), без фоновой архивации
+WORK_DIR = tempfile.mkdtemp(prefix="backend_tests_")
+os.chdir(WORK_DIR)
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/test.db"
+os.environ["ARCHIVE_INTERVAL"] = "0"
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+class FakeGitHub:
+    """Локальный HTTP-сервер вместо github.com и api.github.com.
+
+    respond(path, status, body) ставит ответы на путь в очередь; последний ответ
+    повторяется. requests - полученные запросы (метод, путь, заголовки, тело).
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_request(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                fake.requests.append((self.command, self.path, dict(self.headers), self.rfile.read(length)))
+                queue = fake.responses.get(self.path) or [(404, {"message": "Not Found"})]
+                status, body = queue.pop(0) if len(queue) > 1 else queue[0]
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = handle_request
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def respond(self, path: str, status: int, body):
+        self.responses.setdefault(path, []).append((status, body))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def fake_github(monkeypatch):
+    import github_client
+    # Повторы без задержки
+    monkeypatch.setattr(github_client, "GITHUB_BACKOFF_BASE", 0)
+    server = FakeGitHub()
+    server.start()
+    yield server
+    server.stop()
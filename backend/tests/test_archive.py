@@ -0,0 +1,36 @@
+import archive
+import task_repository
+from stats import check_stats
+
+def create_task(client, title: str, **fields) -> dict:
+    response = client.post("/tasks/", json={"title": title, **fields})
+    assert response.status_code == 200
+    return response.json()
+
+def test_archived_task_id_is_not_reused(client):
+    create_task(client, "Открытая задача")
+    archived = create_task(client, "Архивная задача", assignee="alice", reviewers=["reviewer"])
+    client.patch(f"/tasks/{archived['id']}", json={"status": "closed"})
+    assert client.portal.call(archive.archive_closed_tasks, 0) == 1
+
+    # Архивная задача была последней по id: новая не должна получить ее id
+    created = create_task(client, "Новая задача", assignee="bob")
+    assert created["id"] > archived["id"]
+
+    assert client.get(f"/tasks/{archived['id']}").json()["title"] == "Архивная задача"
+    assert client.get(f"/tasks/{created['id']}").json()["title"] == "Новая задача"
+
+    ids = [task["id"] for task in client.get("/tasks/?include_archived=true&limit=200").json()["items"]]
+    assert len(ids) == len(set(ids))
+    assert {archived["id"], created["id"]} <= set(ids)
+
+    # Участники архивной задачи не переходят к новой
+    assert not client.portal.call(task_repository.has_member, created["id"], "reviewer", "reviewer")
+
+    # Бонус за закрытие новой задачи не считается уже начисленным
+    closed = client.patch(f"/tasks/{created['id']}", json={"status": "closed"}).json()
+    assert closed["points"] == task_repository.CLOSE_BONUS_POINTS
+
+    # Повторная архивация не упирается в уже занятый id архива
+    assert client.portal.call(archive.archive_closed_tasks, 0) == 1
+    assert client.portal.call(check_stats) == []
@@ -0,0 +1,65 @@
+import json
+
+from sqlalchemy import func, select
+
+import task_repository
+from database import database
+from models import task_members
+
+def test_bulk_create_reports_errors_per_item(client):
+    items = [
+        {"title": "Массовая задача 1"},
+        {"assignee": "alice"},
+        '{"title": "Строка с JSON"}',
+        ["title"],
+        {"title": "Массовая задача 2"},
+    ]
+    response = client.post("/tasks/bulk", json=items)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+    results = body["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [result["ok"] for result in results] == [True, False, False, False, True]
+    assert "title" in results[1]["error"]
+    # Строковый элемент не разбирается как JSON второй раз
+    assert results[2]["error"] == results[3]["error"] == "Элемент должен быть JSON-объектом"
+    assert client.get(f"/tasks/{results[4]['id']}").json()["title"] == "Массовая задача 2"
+
+def test_bulk_ndjson_reports_errors_per_line(client):
+    lines = [json.dumps({"title": "NDJSON задача"}), "{не json", json.dumps("строка"), ""]
+    response = client.post(
+        "/tasks/bulk",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    results = response.json()["results"]
+    assert [result["ok"] for result in results] == [True, False, False]
+    assert results[1]["error"].startswith("Некорректный JSON")
+    assert results[2]["error"] == "Элемент должен быть JSON-объектом"
+
+def test_bulk_body_must_be_array(client):
+    assert client.post("/tasks/bulk", json={"title": "Не массив"}).status_code == 400
+
+def test_bulk_update_reports_missing_tasks(client):
+    created = client.post("/tasks/bulk", json=[{"title": "Для обновления"}]).json()["results"][0]
+    response = client.patch("/tasks/bulk", json=[
+        {"id": created["id"], "status": "in_progress"},
+        {"id": 10 ** 9, "status": "in_progress"},
+        {"status": "in_progress"},
+    ])
+    results = response.json()["results"]
+    assert [result["ok"] for result in results] == [True, False, False]
+    assert results[1]["error"] == "Задача не найдена"
+    assert client.get(f"/tasks/{created['id']}").json()["status"] == "in_progress"
+
+def test_bulk_members_are_inserted_in_chunks(client, monkeypatch):
+    # Пачки не совпадают с границами задач: 3 задачи по 8 участников пачками по 5
+    monkeypatch.setattr(task_repository, "MEMBER_INSERT_CHUNK", 5)
+    reviewers = [f"reviewer{n}" for n in range(7)]
+    items = [{"title": f"Участники {n}", "reviewers": reviewers, "watchers": ["watcher"]} for n in range(3)]
+    results = client.post("/tasks/bulk", json=items).json()["results"]
+    ids = [result["id"] for result in results]
+
+    query = select(func.count()).select_from(task_members).where(task_members.c.task_id.in_(ids))
+    assert client.portal.call(database.fetch_val, query) == 3 * (len(reviewers) + 1)
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+WRITERS = 10
+
+def test_concurrent_creates_all_succeed(client):
+    with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+        responses = list(pool.map(
+            lambda number: client.post("/tasks/", json={"title": f"Параллельная задача {number}"}),
+            range(WRITERS),
+        ))
+    assert [response.status_code for response in responses] == [200] * WRITERS
+
+def test_concurrent_creates_and_closes_all_succeed(client):
+    # Каждая запись задачи пишет еще и в tasks_fts, счетчики и журнал баллов (триггеры)
+    def create(number):
+        return client.post("/tasks/", json={"title": f"Гонкапоиск {number}", "assignee": f"user{number}"})
+
+    with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+        created = list(pool.map(create, range(WRITERS)))
+        assert [response.status_code for response in created] == [200] * WRITERS
+        closed = list(pool.map(
+            lambda response: client.patch(f"/tasks/{response.json()['id']}", json={"status": "closed"}),
+            created,
+        ))
+    assert [response.status_code for response in closed] == [200] * WRITERS
+    assert all(response.json()["status"] == "closed" for response in closed)
+
+    found = client.get("/tasks/search", params={"q": "Гонкапоиск", "limit": 100}).json()
+    assert len(found) == WRITERS
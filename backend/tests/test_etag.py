@@ -0,0 +1,47 @@
+from task_cache import task_cache
+
+def conditional_get(client, path: str, etag: str):
+    return client.get(path, headers={"If-None-Match": etag})
+
+def test_task_list_etag(client):
+    first = client.get("/tasks/", params={"limit": 1})
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    not_modified = conditional_get(client, "/tasks/?limit=1", etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag and not_modified.content == b""
+    # Сильная форма того же тега и список тегов тоже совпадают
+    assert conditional_get(client, "/tasks/?limit=1", etag.removeprefix("W/")).status_code == 304
+    assert conditional_get(client, "/tasks/?limit=1", f'"other", {etag}').status_code == 304
+
+    client.post("/tasks/", json={"title": "Меняет версию списка"})
+    changed = conditional_get(client, "/tasks/?limit=1", etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+def test_single_task_etag(client):
+    task = client.post("/tasks/", json={"title": "Задача с ETag"}).json()
+    path = f"/tasks/{task['id']}"
+    etag = client.get(path).headers["ETag"]
+    # Из кэша процесса и из БД (только версия строки) - один и тот же ответ
+    assert conditional_get(client, path, etag).status_code == 304
+    task_cache.invalidate([task["id"]])
+    assert conditional_get(client, path, etag).status_code == 304
+
+    client.patch(path, json={"title": "Задача с новым ETag"})
+    changed = conditional_get(client, path, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["title"] == "Задача с новым ETag"
+
+    client.delete(path)
+    task_cache.invalidate([task["id"]])
+    assert conditional_get(client, path, etag).status_code == 404
+
+def test_stats_etag(client):
+    etag = client.get("/tasks/stats").headers["ETag"]
+    assert conditional_get(client, "/tasks/stats", etag).status_code == 304
+    client.post("/tasks/", json={"title": "Меняет статистику"})
+    changed = conditional_get(client, "/tasks/stats", etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
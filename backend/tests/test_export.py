@@ -0,0 +1,40 @@
+import csv
+import io
+import json
+
+import archive
+
+def export_lines(client, **params):
+    response = client.get("/tasks/export", params=params)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_export_includes_archived_tasks_in_id_order(client):
+    first = client.post("/tasks/", json={"title": "Выгрузка архив", "assignee": "exporter"}).json()
+    second = client.post("/tasks/", json={"title": "Выгрузка открытая", "assignee": "exporter"}).json()
+    client.patch(f"/tasks/{first['id']}", json={"status": "closed"})
+    client.portal.call(archive.archive_closed_tasks, 0)
+
+    assert [task["id"] for task in export_lines(client, assignee="exporter")] == [second["id"]]
+    exported = export_lines(client, assignee="exporter", include_archived="true")
+    assert [task["id"] for task in exported] == [first["id"], second["id"]]
+    assert exported[0]["status"] == "closed"
+    assert "archived_at" not in exported[0]
+
+def test_export_points_ledger(client):
+    task = client.post("/tasks/", json={"title": "Баллы выгрузка", "assignee": "ledger-export"}).json()
+    client.patch(f"/tasks/{task['id']}", json={"status": "closed"})
+
+    entries = export_lines(client, kind="points", login="ledger-export")
+    assert [(entry["task_id"], entry["delta"], entry["idempotency_key"]) for entry in entries] == [
+        (task["id"], 10, f"close:{task['id']}")
+    ]
+    assert entries[0]["created_at"]
+
+    response = client.get("/tasks/export", params={"kind": "points", "format": "csv", "login": "ledger-export"},
+                          headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-disposition"] == 'attachment; filename="points.csv"'
+    assert response.headers["content-encoding"] == "gzip"
+    # httpx распаковывает gzip сам
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["login"], row["delta"]) for row in rows] == [("ledger-export", "10")]
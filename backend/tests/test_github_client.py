@@ -0,0 +1,69 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+import auth
+from github_client import GitHubClient, GITHUB_RETRIES
+
+PROFILE = {"id": 42, "login": "octocat"}
+
+def run(client: GitHubClient, coroutine):
+    async def scenario():
+        try:
+            return await coroutine
+        finally:
+            await client.close()
+    return asyncio.run(scenario())
+
+def test_get_user_retries_unavailable(fake_github):
+    fake_github.respond("/user", 503, {"message": "Service Unavailable"})
+    fake_github.respond("/user", 200, PROFILE)
+    client = GitHubClient(oauth_url=fake_github.url, api_url=fake_github.url)
+
+    assert run(client, client.get_user("token-1")) == PROFILE
+    assert client.stats == {"requests": 2, "retries": 1}
+    assert fake_github.requests[-1][2]["Authorization"] == "Bearer token-1"
+
+def test_exchange_code_is_not_retried(fake_github):
+    fake_github.respond("/login/oauth/access_token", 502, {"error": "bad_gateway"})
+    fake_github.respond("/login/oauth/access_token", 200, {"access_token": "token-1"})
+    client = GitHubClient(oauth_url=fake_github.url, api_url=fake_github.url)
+
+    # Код одноразовый: повтор после 5xx мог бы потратить его дважды
+    assert run(client, client.exchange_code("id", "secret", "code-1")) == {"error": "bad_gateway"}
+    assert client.stats == {"requests": 1, "retries": 0}
+
+def test_connection_errors_are_retried(fake_github):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        closed_url = f"http://127.0.0.1:{probe.getsockname()[1]}"
+    client = GitHubClient(oauth_url=closed_url, api_url=closed_url)
+
+    with pytest.raises(httpx.ConnectError):
+        run(client, client.get_user("token-1"))
+    assert client.stats == {"requests": GITHUB_RETRIES + 1, "retries": GITHUB_RETRIES}
+
+def test_callback_logs_in_through_fake_github(client, fake_github, monkeypatch):
+    fake_github.respond("/login/oauth/access_token", 200, {"access_token": "token-1"})
+    fake_github.respond("/user", 200, PROFILE)
+    github = GitHubClient(oauth_url=fake_github.url, api_url=fake_github.url)
+    monkeypatch.setattr(auth, "github_client", github)
+
+    try:
+        response = client.get("/auth/github/callback", params={"code": "code-1"})
+    finally:
+        client.portal.call(github.close)
+    assert response.status_code == 200
+    session_id = response.cookies["session_id"]
+    # Ключ сессии случайный, а не публичный GitHub id
+    assert session_id != "42" and len(session_id) >= 43
+    assert client.get("/auth/me").json() == PROFILE
+    client.cookies.set("session_id", "42")
+    assert client.get("/auth/me").status_code == 401
+    assert [request[:2] for request in fake_github.requests] == [
+        ("POST", "/login/oauth/access_token"),
+        ("GET", "/user"),
+    ]
+    assert b"code=code-1" in fake_github.requests[0][3]
@@ -0,0 +1,37 @@
+import archive
+
+def create_tasks(client, assignee: str, count: int) -> list:
+    return [client.post("/tasks/", json={"title": f"Страница {n}", "assignee": assignee}).json()["id"] for n in range(count)]
+
+def all_pages(client, **params) -> list:
+    """Страницы списка по next_cursor; проверяет, что каждая не длиннее limit"""
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor is not None else {}))
+        page = client.get("/tasks/", params=query).json()
+        assert len(page["items"]) <= params["limit"]
+        pages.append([task["id"] for task in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+        assert cursor == pages[-1][-1]
+
+def test_keyset_pages_follow_cursor(client):
+    ids = create_tasks(client, "pager", 5)
+    assert all_pages(client, assignee="pager", limit=2) == [ids[0:2], ids[2:4], ids[4:5]]
+    # Полная последняя страница: следующей нет, next_cursor не выдается
+    assert all_pages(client, assignee="pager", limit=5) == [ids]
+    # Курсор - id, а не смещение: удаленная задача не сдвигает следующую страницу
+    client.delete(f"/tasks/{ids[1]}")
+    page = client.get("/tasks/", params={"assignee": "pager", "limit": 2, "cursor": ids[0]}).json()
+    assert [task["id"] for task in page["items"]] == ids[2:4]
+
+def test_include_archived_merges_pages_by_id(client):
+    ids = create_tasks(client, "archive-pager", 6)
+    for task_id in ids[::2]:
+        client.patch(f"/tasks/{task_id}", json={"status": "closed"})
+    client.portal.call(archive.archive_closed_tasks, 0)
+
+    assert sum(all_pages(client, assignee="archive-pager", limit=2), []) == ids[1::2]
+    pages = all_pages(client, assignee="archive-pager", limit=4, include_archived="true")
+    assert pages == [ids[0:4], ids[4:6]]
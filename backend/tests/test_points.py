@@ -0,0 +1,71 @@
+import github_webhook
+import task_repository
+from stats import check_stats, read_stats
+
+def close(client, task_id: int):
+    return client.patch(f"/tasks/{task_id}", json={"status": "closed"}).json()
+
+def test_close_bonus_is_written_to_ledger_once(client):
+    task = client.post("/tasks/", json={"title": "Баллы", "assignee": "ledger-once"}).json()
+    assert close(client, task["id"])["points"] == task_repository.CLOSE_BONUS_POINTS
+    # Повторное закрытие после переоткрытия и закрытие через bulk не начисляют бонус снова
+    client.patch(f"/tasks/{task['id']}", json={"status": "open"})
+    assert close(client, task["id"])["points"] == task_repository.CLOSE_BONUS_POINTS
+    client.patch("/tasks/bulk", json=[{"id": task["id"], "status": "closed"}])
+
+    points = client.get("/users/ledger-once/points").json()
+    assert points["points"] == task_repository.CLOSE_BONUS_POINTS
+    assert [(entry["task_id"], entry["delta"]) for entry in points["history"]] == [
+        (task["id"], task_repository.CLOSE_BONUS_POINTS)
+    ]
+    assert client.portal.call(check_stats) == []
+
+def test_points_go_to_branch_assignee(client):
+    task = client.post("/tasks/", json={"title": "Ветка", "assignee": "someone"}).json()
+    client.patch(f"/tasks/{task['id']}/assign_branch", json={"branch_assignee_github_login": "branch-owner"})
+    close(client, task["id"])
+    assert client.get("/users/branch-owner/points").json()["points"] == task_repository.CLOSE_BONUS_POINTS
+
+def test_points_history_pages_newest_first(client):
+    ids = [client.post("/tasks/", json={"title": f"История {n}", "assignee": "ledger-pages"}).json()["id"] for n in range(3)]
+    for task_id in ids:
+        close(client, task_id)
+
+    first = client.get("/users/ledger-pages/points", params={"limit": 2}).json()
+    assert first["points"] == 3 * task_repository.CLOSE_BONUS_POINTS
+    assert [entry["task_id"] for entry in first["history"]] == [ids[2], ids[1]]
+    second = client.get("/users/ledger-pages/points", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [entry["task_id"] for entry in second["history"]] == [ids[0]]
+    assert second["next_cursor"] is None
+
+    assert client.get("/users/nobody-here/points").json() == {
+        "login": "nobody-here", "points": 0, "history": [], "next_cursor": None,
+    }
+
+def test_webhook_redelivery_does_not_award_twice(client):
+    task = client.post("/tasks/", json={"title": "Webhook баллы", "assignee": "ledger-webhook"}).json()
+    payload = {
+        "action": "closed",
+        "pull_request": {
+            "merged": True, "body": f"Closes TASK-{task['id']}",
+            "head": {"ref": "feature/points"}, "base": {"ref": "main"},
+        },
+    }
+    for _ in range(2):
+        client.portal.call(github_webhook.process_event, "pull_request", payload, "points-delivery-1")
+
+    points = client.get("/users/ledger-webhook/points").json()
+    assert points["points"] == task_repository.CLOSE_BONUS_POINTS
+    assert [entry["delivery_id"] for entry in points["history"]] == ["points-delivery-1"]
+
+def test_leaders_follow_ledger_totals(client):
+    for n in range(3):
+        task = client.post("/tasks/", json={"title": f"Лидер {n}", "assignee": "ledger-leader"}).json()
+        close(client, task["id"])
+
+    leaders = client.portal.call(read_stats, 1000)["points_leaders"]
+    assert {"assignee": "ledger-leader", "points": 3 * task_repository.CLOSE_BONUS_POINTS} in leaders
+    assert [leader["points"] for leader in leaders] == sorted((leader["points"] for leader in leaders), reverse=True)
+
+    endpoint = client.get("/tasks/stats").json()["points_leaders"]
+    assert endpoint == leaders[:len(endpoint)]
@@ -0,0 +1,20 @@
+from database import database
+from models import task_status_deltas
+from stats import check_stats, read_stats
+
+def test_unfolded_deltas_are_counted(client):
+    client.post("/tasks/", json={"title": "Задача"})
+    before = client.portal.call(read_stats)["statuses"]
+
+    # Так пишут триггеры Postgres: одна задача перешла из open в done, свертки еще не было
+    client.portal.call(database.execute, task_status_deltas.insert().values(status="open", delta=-1))
+    client.portal.call(database.execute, task_status_deltas.insert().values(status="done", delta=1))
+
+    statuses = client.portal.call(read_stats)["statuses"]
+    assert statuses["open"] == before["open"] - 1
+    assert statuses["done"] == before.get("done", 0) + 1
+
+    # Задача в БД по-прежнему open: сверка видит расхождение и перестраивает обе таблицы
+    assert client.portal.call(check_stats, True)
+    assert client.portal.call(check_stats) == []
+    assert client.portal.call(read_stats)["statuses"] == before
@@ -0,0 +1,32 @@
+import archive
+from task_cache import task_cache
+
+def test_cache_is_invalidated_by_every_write(client):
+    task = client.post("/tasks/", json={"title": "Кэшируемая задача", "assignee": "alice"}).json()
+    path = f"/tasks/{task['id']}"
+    first = client.get(path)
+    hits = task_cache.hits
+    assert client.get(path).content == first.content
+    assert task_cache.hits == hits + 1
+
+    client.patch(path, json={"title": "Переименована"})
+    assert client.get(path).json()["title"] == "Переименована"
+
+    client.patch("/tasks/bulk", json=[{"id": task["id"], "status": "closed"}])
+    closed = client.get(path).json()
+    assert closed["status"] == "closed" and closed["points"] == 10
+
+    assert client.portal.call(archive.archive_closed_tasks, 0) >= 1
+    assert task["id"] not in task_cache._entries
+    assert client.get(path).json()["title"] == "Переименована"
+
+    assert client.delete(path).status_code == 204
+    assert client.get(path).status_code == 404
+
+def test_insert_drops_stale_entry(client):
+    created = client.post("/tasks/", json={"title": "Новая"}).json()
+    # Запись, оставшаяся под тем же id (например, от ранее выданного id), сбрасывается при вставке
+    task_cache.put(created["id"] + 1, b"{}", 'W/"stale"', task_cache.generation)
+    second = client.post("/tasks/", json={"title": "Следующая"}).json()
+    assert second["id"] == created["id"] + 1
+    assert client.get(f"/tasks/{second['id']}").json()["title"] == "Следующая"
@@ -0,0 +1,89 @@
+import github_webhook
+import task_refs
+from task_refs import TaskRefMatcher
+
+def test_overlong_task_id_is_not_a_ref():
+    matcher = TaskRefMatcher(prefixes=["TASK"])
+    assert matcher.find_all("TASK-12345678901234567890, TASK-7, TASK-999999999") == [7, 999999999]
+    assert matcher.first("TASK-1234567890") is None
+
+def test_overlong_ref_does_not_fail_the_push(client):
+    task = client.post("/tasks/", json={"title": "Задача из пуша"}).json()
+    branch = f"feature/TASK-{task['id']}"
+    client.portal.call(github_webhook.process_event, "create", {"ref_type": "branch", "ref": branch})
+
+    payload = {
+        "ref": f"refs/heads/{branch}",
+        "commits": [{"message": f"TASK-{task['id']} готово, заодно TASK-12345678901234567890"}],
+    }
+    assert client.portal.call(github_webhook.process_event, "push", payload) == {"ok": True}
+    assert client.get(f"/tasks/{task['id']}").json()["status"] == "Ожидает ревью"
+
+def test_several_prefixes_case_insensitive():
+    matcher = TaskRefMatcher(prefixes=["TASK", "BUG"])
+    assert matcher.find_all("TASK-1, bug-2 и BUG-3; FEAT-4, TASK-1 снова") == [1, 2, 3]
+
+def test_prefix_must_not_be_a_word_tail():
+    matcher = TaskRefMatcher(prefixes=["TASK"])
+    assert matcher.find_all("SUBTASK-1 MYTASK-2 TASK-3") == [3]
+    assert matcher.first("SUBTASK-1") is None
+
+def test_keyword_applies_to_the_whole_list():
+    matcher = TaskRefMatcher(prefixes=["TASK"], close_keywords=["fixes", "closes"])
+    text = "fixes TASK-1, TASK-2 and TASK-3 & TASK-4. See TASK-5"
+    assert matcher.closing_ids(text) == [1, 2, 3, 4]
+    assert matcher.find_all(text) == [1, 2, 3, 4, 5]
+
+def test_keyword_must_be_a_whole_word():
+    matcher = TaskRefMatcher(prefixes=["TASK"], close_keywords=["fixes"])
+    assert matcher.closing_ids("prefixes TASK-1") == []
+    assert matcher.closing_ids("Fixes: TASK-2") == [2]
+
+def test_bracketed_refs():
+    matcher = TaskRefMatcher(prefixes=["TASK"], close_keywords=["closes"])
+    assert matcher.refs("Closes [TASK-2], [TASK-3]; упомянута [TASK-5]") == [(2, True), (3, True), (5, False)]
+    assert matcher.closing_ids("closes (#TASK-6)") == [6]
+
+def test_closing_ref_at_the_end_of_a_url():
+    matcher = TaskRefMatcher(prefixes=["TASK"], close_keywords=["fixes"])
+    assert matcher.closing_ids("fixes https://tracker.example.com/browse/TASK-4") == [4]
+    assert matcher.closing_ids("fixes TASK-1, https://tracker.example.com/TASK-2") == [1, 2]
+    assert matcher.closing_ids("см. https://tracker.example.com/browse/TASK-4") == []
+
+def test_closing_ref_outranks_plain_mention():
+    matcher = TaskRefMatcher(prefixes=["TASK"], close_keywords=["fixes"])
+    assert matcher.refs("TASK-1 в работе; fixes TASK-1") == [(1, True)]
+
+def test_env_lists(monkeypatch):
+    monkeypatch.setenv("TASK_REF_PREFIXES", " TASK, BUG ,,")
+    assert task_refs.env_list("TASK_REF_PREFIXES", "TASK") == ["TASK", "BUG"]
+    monkeypatch.delenv("TASK_REF_PREFIXES")
+    assert task_refs.env_list("TASK_REF_PREFIXES", "TASK") == ["TASK"]
+
+def merged_pr(body: str, base: str):
+    return {
+        "action": "closed",
+        "pull_request": {"merged": True, "body": body, "head": {"ref": "feature/x"}, "base": {"ref": base}},
+    }
+
+def test_pr_close_requires_keyword_switch(client, monkeypatch):
+    first, second = (client.post("/tasks/", json={"title": title}).json()["id"] for title in ("Первая", "Вторая"))
+    body = f"fixes TASK-{first}, см. также TASK-{second}"
+
+    monkeypatch.setattr(github_webhook, "PR_CLOSE_REQUIRES_KEYWORD", True)
+    client.portal.call(github_webhook.process_event, "pull_request", merged_pr(body, "main"))
+    assert client.get(f"/tasks/{first}").json()["status"] == "closed"
+    assert client.get(f"/tasks/{second}").json()["status"] == "open"
+
+    monkeypatch.setattr(github_webhook, "PR_CLOSE_REQUIRES_KEYWORD", False)
+    client.portal.call(github_webhook.process_event, "pull_request", merged_pr(body, "main"))
+    assert client.get(f"/tasks/{second}").json()["status"] == "closed"
+
+def test_protected_branches_switch(client, monkeypatch):
+    task_id = client.post("/tasks/", json={"title": "Задача релиза"}).json()["id"]
+    monkeypatch.setattr(task_refs, "PROTECTED_BRANCHES", ["release"])
+
+    client.portal.call(github_webhook.process_event, "pull_request", merged_pr(f"TASK-{task_id}", "main"))
+    assert client.get(f"/tasks/{task_id}").json()["status"] == "open"
+    client.portal.call(github_webhook.process_event, "pull_request", merged_pr(f"TASK-{task_id}", "release"))
+    assert client.get(f"/tasks/{task_id}").json()["status"] == "closed"
@@ -0,0 +1,38 @@
+import hashlib
+import os
+
+import uploads
+
+def test_upload_is_stored_under_its_digest(client):
+    content = os.urandom(3 * uploads.CHUNK_SIZE // 2)
+    response = client.post("/uploads/", files={"file": ("report.PDF", content, "application/pdf")})
+    assert response.status_code == 200
+    digest = hashlib.sha256(content).hexdigest()
+    assert response.json()["url"] == f"/uploads/{digest}.pdf"
+    with open(os.path.join(uploads.UPLOAD_DIR, f"{digest}.pdf"), "rb") as stored:
+        assert stored.read() == content
+
+def test_oversized_upload_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1024)
+    response = client.post("/uploads/", files={"file": ("big.bin", b"x" * 2048)})
+    assert response.status_code == 413
+    assert not [name for name in os.listdir(uploads.UPLOAD_DIR) if name.endswith(".part")]
+
+def test_oversized_content_length_is_rejected_before_reading(client):
+    def body():
+        raise AssertionError("тело не должно читаться")
+        yield b""
+
+    response = client.post(
+        "/uploads/",
+        content=body(),
+        headers={
+            "Content-Type": "multipart/form-data; boundary=x",
+            "Content-Length": str(uploads.MAX_UPLOAD_BYTES + uploads.MAX_MULTIPART_OVERHEAD + 1),
+        },
+    )
+    assert response.status_code == 413
+
+def test_upload_without_file_field(client):
+    response = client.post("/uploads/", data={"title": "no file"}, files={"other": ("a.txt", b"a")})
+    assert response.status_code == 400
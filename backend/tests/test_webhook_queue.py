@@ -0,0 +1,109 @@
+import asyncio
+from datetime import timedelta
+
+from database import database
+from models import webhook_deliveries
+from github_webhook import ordering_key
+from webhook_queue import WebhookQueue, utcnow
+
+async def delivery_status(delivery_id):
+    query = webhook_deliveries.select().where(webhook_deliveries.c.delivery_id == delivery_id)
+    return (await database.fetch_one(query))["status"]
+
+def test_stopped_worker_returns_delivery_to_pending(client):
+    started = asyncio.Event()
+
+    async def handler(event, payload, delivery_id):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def scenario():
+        queue = WebhookQueue(handler, workers=1)
+        await queue.start()
+        await queue.submit("cancelled-1", "push", {})
+        await started.wait()
+        assert await delivery_status("cancelled-1") == "processing"
+        await queue.stop()
+        return await delivery_status("cancelled-1")
+
+    assert client.portal.call(scenario) == "pending"
+
+def test_abandoned_delivery_is_recovered_on_start(client):
+    handled = []
+
+    async def handler(event, payload, delivery_id):
+        handled.append(delivery_id)
+
+    async def scenario():
+        # Процесс упал посреди обработки: строки остались в processing
+        now = utcnow()
+        await database.execute(webhook_deliveries.insert().values([
+            {"delivery_id": "abandoned-1", "event": "push", "payload": {}, "status": "processing",
+             "received_at": now, "claimed_at": now - timedelta(hours=1)},
+            {"delivery_id": "in-flight-1", "event": "push", "payload": {}, "status": "processing",
+             "received_at": now, "claimed_at": now},
+        ]))
+        queue = WebhookQueue(handler, workers=1, lease_seconds=60)
+        await queue.start()
+        await queue.join()
+        await queue.stop()
+        return await delivery_status("abandoned-1"), await delivery_status("in-flight-1")
+
+    assert client.portal.call(scenario) == ("done", "processing")
+    assert handled == ["abandoned-1"]
+
+def test_redelivery_retries_failed_delivery(client):
+    attempts = []
+
+    async def handler(event, payload, delivery_id):
+        attempts.append(delivery_id)
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+
+    async def scenario():
+        queue = WebhookQueue(handler, workers=1)
+        await queue.start()
+        assert await queue.submit("redelivered-1", "push", {})
+        await queue.join()
+        failed = await delivery_status("redelivered-1")
+        # Redeliver в GitHub - тот же delivery_id
+        assert await queue.submit("redelivered-1", "push", {})
+        await queue.join()
+        done = await delivery_status("redelivered-1")
+        # Обработанную доставку повтор уже не трогает
+        duplicate = await queue.submit("redelivered-1", "push", {})
+        await queue.stop()
+        return failed, done, duplicate
+
+    assert client.portal.call(scenario) == ("failed", "done", False)
+    assert attempts == ["redelivered-1", "redelivered-1"]
+
+def test_multi_task_event_is_ordered_with_each_task(client):
+    log = []
+
+    async def handler(event, payload, delivery_id):
+        log.append(("start", delivery_id))
+        await asyncio.sleep(payload["delay"])
+        log.append(("end", delivery_id))
+
+    async def scenario():
+        # task:1 и task:2 достаются разным воркерам (см. key_lanes)
+        queue = WebhookQueue(handler, workers=4, key_func=lambda event, payload: payload["key"])
+        await queue.start()
+        await queue.submit("order-1", "push", {"key": "task:1", "delay": 0.05})
+        await queue.submit("order-2", "pull_request", {"key": "task:1,task:2", "delay": 0.02})
+        await queue.submit("order-3", "push", {"key": "task:2", "delay": 0})
+        await queue.join()
+        await queue.stop()
+
+    client.portal.call(scenario)
+    assert log.index(("end", "order-1")) < log.index(("start", "order-2"))
+    assert log.index(("end", "order-2")) < log.index(("start", "order-3"))
+
+def test_ordering_key_covers_every_referenced_task():
+    push = {"ref": "refs/heads/feature/TASK-5", "commits": [{"message": "TASK-7"}, {"message": "fixes TASK-3"}]}
+    assert ordering_key("push", push) == "task:3,task:5,task:7"
+    merged = {"pull_request": {"head": {"ref": "hotfix"}, "body": "Closes TASK-9, TASK-2"}}
+    assert ordering_key("pull_request", merged) == "task:2,task:9"
+    assert ordering_key("push", {"ref": "refs/heads/docs", "commits": [{"message": "typo"}]}) == "branch:docs"
+    assert ordering_key("ping", {}) is None
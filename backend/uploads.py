@@ -0,0 +1,212 @@
+"""Загрузка файлов: потоковая запись, адресация по содержимому и миниатюры.
+
+Тело запроса разбирается потоково (python-multipart) прямо из сокета: часть с файлом
+пишется на диск один раз и одновременно хешируется (SHA-256), лимит MAX_UPLOAD_BYTES
+проверяется по Content-Length до чтения тела и по мере чтения. Итоговое имя -
+<sha256>.<ext>, поэтому повторная загрузка того же файла ничего не стоит, а URL
+стабилен. Для изображений в пуле потоков (вне event loop) строится миниатюра
+thumbs/<sha256>.webp - ее показывают карточки вместо оригинала.
+Pillow - необязательная зависимость: без нее миниатюры не создаются.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import APIRouter, HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+try:
+    from PIL import Image, features
+except ImportError:  # pragma: no cover - миниатюры просто не создаются
+    Image = None
+
+logger = logging.getLogger("uploads")
+
+router = APIRouter()
+
+UPLOAD_DIR = "backend/uploads"
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbs")
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Запас на границы и заголовки частей multipart сверх размера самого файла
+MAX_MULTIPART_OVERHEAD = 64 * 1024
+UPLOAD_FIELD = "file"
+CHUNK_SIZE = 1024 * 1024
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+# Защита от "декомпрессионных бомб": изображения больше этого числа пикселей не разбираем
+MAX_IMAGE_PIXELS = 50_000_000
+
+EXTENSION_RE = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+thumbnail_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+
+def thumbnails_supported() -> bool:
+    return Image is not None and features.check("webp")
+
+def safe_extension(filename: str) -> str:
+    """Расширение исходного файла в нижнем регистре; пустое, если оно подозрительное"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if EXTENSION_RE.match(extension) else ""
+
+def make_thumbnail(source_path: str, thumbnail_path: str) -> bool:
+    """Уменьшенная копия изображения (выполняется в пуле потоков). False - не изображение"""
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with Image.open(source_path) as image:
+            image.draft("RGB", THUMBNAIL_SIZE)  # для JPEG декодирует сразу в уменьшенном масштабе
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            # Пишем во временный файл и переименовываем, чтобы не отдать недописанную миниатюру
+            fd, tmp_path = tempfile.mkstemp(dir=THUMBNAIL_DIR, suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp_file:
+                image.save(tmp_file, "WEBP", quality=80)
+            os.replace(tmp_path, thumbnail_path)
+        return True
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.info("Миниатюра для %s не создана: %s", source_path, e)
+        return False
+
+async def ensure_thumbnail(digest: str, source_path: str):
+    """URL миниатюры (создает ее при необходимости) или None"""
+    if not thumbnails_supported():
+        return None
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{digest}.webp")
+    if not os.path.exists(thumbnail_path):
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(thumbnail_pool, make_thumbnail, source_path, thumbnail_path):
+            return None
+    return f"/uploads/thumbs/{digest}.webp"
+
+def too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Файл больше {MAX_UPLOAD_BYTES // (1024 * 1024)} МБ")
+
+class UploadPartWriter:
+    """Колбэки python-multipart: содержимое поля UPLOAD_FIELD пишется в buffer по мере разбора"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.filename = None
+        self.found = False
+        self._writing = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_field_data(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Берется первая часть с файлом; остальные поля формы пропускаются
+        if not self.found and options.get(b"name") == UPLOAD_FIELD.encode() and b"filename" in options:
+            self.found = self._writing = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def _part_data(self, data, start, end):
+        if not self._writing:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise too_large()
+        self.sha256.update(chunk)
+        self.buffer.write(chunk)
+
+    def _part_end(self):
+        self._writing = False
+
+async def store_upload(request: Request):
+    """Потоково сохраняет файл из multipart-тела под его SHA-256; возвращает (digest, путь к файлу)"""
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Ожидается multipart/form-data")
+    max_body = MAX_UPLOAD_BYTES + MAX_MULTIPART_OVERHEAD
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+        # Отказ до чтения тела
+        raise too_large()
+
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            writer = UploadPartWriter(buffer)
+            parser = MultipartParser(options[b"boundary"], writer.callbacks())
+            received = 0
+            # Без Content-Length (chunked) лимит проверяется по прочитанному
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_body:
+                    raise too_large()
+                parser.write(chunk)
+            parser.finalize()
+        if not writer.found:
+            raise HTTPException(status_code=400, detail=f"В форме нет файла в поле {UPLOAD_FIELD!r}")
+
+        digest = writer.sha256.hexdigest()
+        file_path = os.path.join(UPLOAD_DIR, f"{digest}{safe_extension(writer.filename)}")
+        if os.path.exists(file_path):
+            # Такой файл уже есть - дубликат ничего не стоит
+            os.remove(tmp_path)
+        else:
+            # Атомарное переименование: параллельные загрузки того же файла не конфликтуют
+            os.replace(tmp_path, file_path)
+        return digest, file_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def init_upload_dirs():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+
+# Тело разбирается вручную (store_upload), поэтому схема формы для /docs описана явно
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+                "required": [UPLOAD_FIELD],
+            }
+        }
+    },
+}
+
+# Эндпоинт для загрузки файлов
+@router.post("/uploads/", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_file(request: Request):
+    digest, file_path = await store_upload(request)
+    thumbnail_url = await ensure_thumbnail(digest, file_path)
+    # Возвращаем относительные URL: имя файла определяется содержимым
+    return {"url": f"/uploads/{os.path.basename(file_path)}", "thumbnail_url": thumbnail_url}
@@ -0,0 +1,168 @@
+"""Версии данных для ETag и условных GET.
+
+tasks.version - версия строки, растет при каждом UPDATE задачи; table_versions['tasks'] -
+версия всей таблицы, растет при любом INSERT/UPDATE/DELETE в tasks. Обе поддерживаются
+триггерами, поэтому их меняет любой путь записи (эндпоинты, webhook, ручной SQL).
+task_repository сам увеличивает tasks.version в своих UPDATE, и в SQLite запасной
+триггер ничего не делает; в Postgres версию строки всегда ставит BEFORE-триггер.
+Запись в архив (tasks_archive) тоже увеличивает версию таблицы tasks: список с
+include_archived и статистика зависят от него.
+
+В Postgres версия таблицы увеличивается один раз за транзакцию, отложенным триггером
+в момент COMMIT. Строка table_versions блокируется последней и только до конца коммита:
+транзакции с записью в tasks не выстраиваются в очередь на ней с первого UPDATE и не
+могут взаимно заблокироваться, держа ее и ожидая строку задачи.
+
+Эндпоинты отдают слабый ETag из версии и на совпадающий If-None-Match отвечают 304,
+прочитав только версию (одна строка по первичному ключу), без выборки и сериализации задач.
+"""
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select, text
+
+from database import database
+from models import tasks, tasks_archive, table_versions
+
+TASKS_VERSION_KEY = "tasks"
+
+SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_version_insert",
+    """
+    CREATE TRIGGER tasks_version_insert AFTER INSERT ON tasks
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_version_update",
+    """
+    CREATE TRIGGER tasks_version_update AFTER UPDATE ON tasks
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_version_delete",
+    """
+    CREATE TRIGGER tasks_version_delete AFTER DELETE ON tasks
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+    END
+    """,
+    # SQLite не дает менять NEW в BEFORE-триггере: если UPDATE не увеличил версию строки сам,
+    # это делает отдельный UPDATE (recursive_triggers выключены, повторно триггер не сработает)
+    "DROP TRIGGER IF EXISTS tasks_row_version",
+    """
+    CREATE TRIGGER tasks_row_version AFTER UPDATE ON tasks
+    WHEN NEW.version IS OLD.version
+    BEGIN
+        UPDATE tasks SET version = OLD.version + 1 WHERE id = NEW.id;
+    END
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION tasks_row_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := OLD.version + 1;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tasks_row_version ON tasks",
+    """
+    CREATE TRIGGER tasks_row_version BEFORE UPDATE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION tasks_row_version()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tasks_table_version() RETURNS trigger AS $$
+    BEGIN
+        -- Отложенный триггер срабатывает на каждую строку при COMMIT; версию увеличивает первый,
+        -- флаг в настройке транзакции (set_config(..., true)) сбрасывается вместе с ней
+        IF current_setting('tasks_version.bumped', true) IS DISTINCT FROM 'on' THEN
+            PERFORM set_config('tasks_version.bumped', 'on', true);
+            UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tasks_table_version ON tasks",
+    """
+    CREATE CONSTRAINT TRIGGER tasks_table_version AFTER INSERT OR UPDATE OR DELETE ON tasks
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION tasks_table_version()
+    """,
+]
+
+ARCHIVE_SQLITE_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_archive_version_insert",
+    """
+    CREATE TRIGGER tasks_archive_version_insert AFTER INSERT ON tasks_archive
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+    END
+    """,
+    "DROP TRIGGER IF EXISTS tasks_archive_version_delete",
+    """
+    CREATE TRIGGER tasks_archive_version_delete AFTER DELETE ON tasks_archive
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+    END
+    """,
+]
+
+ARCHIVE_POSTGRES_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS tasks_archive_table_version ON tasks_archive",
+    """
+    CREATE CONSTRAINT TRIGGER tasks_archive_table_version AFTER INSERT OR DELETE ON tasks_archive
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION tasks_table_version()
+    """,
+]
+
+def install_version_triggers(connection):
+    """Создает (пересоздает) триггеры версий"""
+    statements = POSTGRES_TRIGGERS if connection.dialect.name == "postgresql" else SQLITE_TRIGGERS
+    for statement in statements:
+        connection.execute(text(statement))
+
+def install_archive_version_triggers(connection):
+    """Создает (пересоздает) триггеры версии таблицы tasks на архиве"""
+    statements = ARCHIVE_POSTGRES_TRIGGERS if connection.dialect.name == "postgresql" else ARCHIVE_SQLITE_TRIGGERS
+    for statement in statements:
+        connection.execute(text(statement))
+
+async def table_version(name: str = TASKS_VERSION_KEY) -> int:
+    query = select(table_versions.c.version).where(table_versions.c.name == name)
+    return await database.fetch_val(query) or 0
+
+async def task_version(task_id: int) -> Optional[int]:
+    """Версия строки задачи (в том числе архивной) или None, если задачи нет"""
+    version = await database.fetch_val(select(tasks.c.version).where(tasks.c.id == task_id))
+    if version is None:
+        version = await database.fetch_val(select(tasks_archive.c.version).where(tasks_archive.c.id == task_id))
+    return version
+
+def weak_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Слабое сравнение If-None-Match с etag (RFC 9110: префикс W/ не учитывается)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def set_etag(response: Response, etag: str):
+    # no-cache: браузер хранит ответ, но перед использованием перепроверяет его по ETag
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
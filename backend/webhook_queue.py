@@ -0,0 +1,250 @@
+"""Асинхронная очередь обработки GitHub webhook.
+
+Эндпоинт /webhook только сохраняет событие в webhook_deliveries (ключ - X-GitHub-Delivery)
+и сразу отвечает GitHub. Обработку выполняет фиксированный пул asyncio-воркеров.
+Ключ упорядочивания события - задачи, которые оно может изменить ("task:1,task:7"), или
+ветка. События с общим ключом всегда попадают к одному воркеру, поэтому для каждой задачи
+они применяются в порядке поступления. Событие нескольких задач, чьи ключи достались разным
+воркерам, ставится в очередь каждого из них и обрабатывается, когда до него дошли все
+(см. SharedTurn): оно упорядочено с событиями каждой своей задачи.
+
+Событие в обработке помечено status=processing и временем claimed_at. При остановке
+воркер возвращает его в pending; если процесс упал, при следующем запуске в pending
+возвращаются события, взятые больше WEBHOOK_LEASE_SECONDS секунд назад.
+"""
+import asyncio
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import database
+from models import webhook_deliveries
+
+logger = logging.getLogger("webhook_queue")
+
+# Столько секунд событие может оставаться в processing, прежде чем его сочтут брошенным
+WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", "300"))
+
+def key_lanes(ordering_key: str, lanes: int):
+    """Номера очередей (воркеров) для ключа упорядочивания; у события нескольких задач их может быть несколько.
+    crc32 стабилен между процессами, в отличие от hash() для строк"""
+    return sorted({zlib.crc32(key.encode()) % lanes for key in ordering_key.split(",")})
+
+class SharedTurn:
+    """Место события в очередях нескольких воркеров. Обрабатывает его воркер, до которого оно
+    дошло последним; остальные ждут конца обработки, не беря следующие события. События
+    ставятся во все очереди сразу (без await), поэтому порядок в очередях согласован и
+    взаимного ожидания не бывает"""
+
+    def __init__(self, parts: int):
+        self._waiting = parts
+        self._done = asyncio.Event()
+
+    async def arrive(self) -> bool:
+        """True - обрабатывать этому воркеру"""
+        self._waiting -= 1
+        if self._waiting:
+            await self._done.wait()
+            return False
+        return True
+
+    def finish(self):
+        self._done.set()
+
+def utcnow():
+    # В БД храним naive UTC: SQLite не сохраняет часовой пояс
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def insert_ignore_duplicates(table):
+    """INSERT, который молча пропускает конфликт по первичному ключу"""
+    dialect = postgresql if database.url.dialect == "postgresql" else sqlite
+    return dialect.insert(table).on_conflict_do_nothing()
+
+class WebhookQueue:
+    def __init__(self, handler, workers: int = 4, key_func=None, lease_seconds: float = WEBHOOK_LEASE_SECONDS):
+        self._handler = handler
+        self._key_func = key_func or (lambda event, payload: None)
+        self._workers = workers
+        self._lease_seconds = lease_seconds
+        # Очереди создаются в start(), внутри работающего event loop
+        self._queues = []
+        self._tasks = []
+        # delivery_id -> received_at для событий, которые еще не обработаны этим процессом
+        self._pending = {}
+        self._last_lag = 0.0
+        self._counters = {"accepted": 0, "duplicates": 0, "processed": 0, "failed": 0, "skipped": 0}
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def _queues_for(self, ordering_key):
+        if ordering_key is None:
+            # Без ключа порядок не важен - берем самую короткую очередь
+            return [min(self._queues, key=lambda queue: queue.qsize())]
+        return [self._queues[index] for index in key_lanes(ordering_key, len(self._queues))]
+
+    def _enqueue(self, delivery_id, event, payload, ordering_key, received_at):
+        self._pending[delivery_id] = received_at
+        queues = self._queues_for(ordering_key)
+        turn = SharedTurn(len(queues)) if len(queues) > 1 else None
+        for queue in queues:
+            queue.put_nowait((delivery_id, event, payload, turn))
+
+    async def start(self):
+        """Запускает воркеры и ставит в очередь необработанные события, сохраненные до рестарта"""
+        self._queues = [asyncio.Queue() for _ in range(self._workers)]
+        self._pending = {}
+        # Брошенные упавшим процессом события: взяты в обработку дольше lease_seconds назад
+        query = (
+            webhook_deliveries.update()
+            .where(
+                webhook_deliveries.c.status == "processing",
+                webhook_deliveries.c.claimed_at < utcnow() - timedelta(seconds=self._lease_seconds),
+            )
+            .values(status="pending", claimed_at=None)
+            .returning(webhook_deliveries.c.delivery_id)
+        )
+        abandoned = await database.fetch_all(query)
+        if abandoned:
+            logger.warning("Возвращено в очередь брошенных webhook: %d", len(abandoned))
+
+        query = (
+            webhook_deliveries.select()
+            .where(webhook_deliveries.c.status == "pending")
+            .order_by(webhook_deliveries.c.received_at)
+        )
+        recovered = await database.fetch_all(query)
+        for row in recovered:
+            self._enqueue(row["delivery_id"], row["event"], row["payload"], row["ordering_key"], row["received_at"])
+        if recovered:
+            logger.info("Восстановлено необработанных webhook: %d", len(recovered))
+
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self):
+        """Останавливает воркеры; необработанные и прерванные события остаются в БД в статусе pending"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, delivery_id: str, event: str, payload: dict) -> bool:
+        """Сохраняет событие и ставит его в очередь. False - такая доставка уже была.
+        Повторная доставка упавшего события (Redeliver в GitHub) обрабатывается заново"""
+        ordering_key = self._key_func(event, payload)
+        received_at = utcnow()
+        query = insert_ignore_duplicates(webhook_deliveries).values(
+            delivery_id=delivery_id,
+            event=event,
+            payload=payload,
+            ordering_key=ordering_key,
+            status="pending",
+            received_at=received_at,
+        ).returning(webhook_deliveries.c.delivery_id)
+        if await database.fetch_one(query) is None and not await self._retry_failed(delivery_id, received_at):
+            self._counters["duplicates"] += 1
+            logger.info("Повторная доставка %s (%s) пропущена", delivery_id, event)
+            return False
+
+        self._counters["accepted"] += 1
+        self._enqueue(delivery_id, event, payload, ordering_key, received_at)
+        return True
+
+    async def _retry_failed(self, delivery_id, received_at) -> bool:
+        # Упавшая доставка (например, из-за временной ошибки БД) снова ждет воркера;
+        # обработанные и взятые в работу остаются дубликатами
+        query = (
+            webhook_deliveries.update()
+            .where(webhook_deliveries.c.delivery_id == delivery_id, webhook_deliveries.c.status == "failed")
+            .values(status="pending", error=None, received_at=received_at)
+            .returning(webhook_deliveries.c.delivery_id)
+        )
+        return await database.fetch_one(query) is not None
+
+    async def _claim(self, delivery_id) -> bool:
+        # Забираем событие атомарно: при нескольких процессах его обработает только один
+        query = (
+            webhook_deliveries.update()
+            .where(webhook_deliveries.c.delivery_id == delivery_id, webhook_deliveries.c.status == "pending")
+            .values(status="processing", claimed_at=utcnow())
+            .returning(webhook_deliveries.c.delivery_id)
+        )
+        return await database.fetch_one(query) is not None
+
+    async def _release(self, delivery_id):
+        # Прерванная обработка: транзакция обработчика откатилась, событие снова ждет воркера
+        query = (
+            webhook_deliveries.update()
+            .where(webhook_deliveries.c.delivery_id == delivery_id, webhook_deliveries.c.status == "processing")
+            .values(status="pending", claimed_at=None)
+        )
+        await database.execute(query)
+
+    async def _finish(self, delivery_id, status, error=None):
+        query = webhook_deliveries.update().where(webhook_deliveries.c.delivery_id == delivery_id).values(
+            status=status, error=error, processed_at=utcnow()
+        )
+        await database.execute(query)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            delivery_id, event, payload, turn = await queue.get()
+            try:
+                if turn is not None and not await turn.arrive():
+                    continue
+                try:
+                    await self._process(delivery_id, event, payload)
+                finally:
+                    if turn is not None:
+                        turn.finish()
+            finally:
+                queue.task_done()
+
+    async def _process(self, delivery_id, event, payload):
+        try:
+            received_at = self._pending.pop(delivery_id, None)
+            if received_at is not None:
+                self._last_lag = (utcnow() - received_at).total_seconds()
+
+            if not await self._claim(delivery_id):
+                self._counters["skipped"] += 1
+                return
+
+            try:
+                result = await self._handler(event, payload, delivery_id)
+            except asyncio.CancelledError:
+                await self._release(delivery_id)
+                raise
+            except Exception as e:
+                self._counters["failed"] += 1
+                logger.error("Ошибка обработки webhook %s (%s): %s", delivery_id, event, e, exc_info=True)
+                await self._finish(delivery_id, "failed", error=str(e))
+            else:
+                self._counters["processed"] += 1
+                if result and not result.get("ok", True):
+                    logger.info("Webhook %s (%s) не применен: %s", delivery_id, event, result.get("reason"))
+                await self._finish(delivery_id, "done")
+        except Exception as e:
+            # Ошибка записи статуса не должна останавливать воркер
+            logger.error("Ошибка воркера webhook при обработке %s: %s", delivery_id, e, exc_info=True)
+
+    async def join(self):
+        """Ждет, пока все поставленные в очередь события будут обработаны"""
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+
+    def metrics(self) -> dict:
+        """Глубина очереди и задержка обработки - для подбора числа воркеров"""
+        now = utcnow()
+        oldest = min(self._pending.values(), default=None)
+        return {
+            "workers": self.workers,
+            "depth": sum(queue.qsize() for queue in self._queues),
+            "depth_per_worker": [queue.qsize() for queue in self._queues],
+            "oldest_pending_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+            "last_lag_seconds": self._last_lag,
+            **self._counters,
+        }
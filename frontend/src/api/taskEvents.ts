@@ -0,0 +1,84 @@
+import { useEffect } from 'react'
+import { InfiniteData, QueryClient, useQueryClient } from '@tanstack/react-query'
+import { API_URL, StatsData, Task, TaskFilters, TaskPage } from './tasksApi'
+
+// Данные, которые обновляет поток /tasks/events, не устаревают сами по себе:
+// без повторных запросов по таймеру и при фокусе вкладки
+export const LIVE_STALE_TIME = Infinity
+
+// Поля, от которых зависит попадание задачи в отфильтрованный список
+const FILTERED_FIELDS: (keyof Task)[] = ['status', 'assignee', 'branch_name', 'reviewers', 'watchers']
+
+type TasksData = InfiniteData<TaskPage, number | null>
+
+const hasFilters = (filters: TaskFilters | undefined) =>
+  !!filters && Object.values(filters).some(value => value !== undefined && value !== '')
+
+// Применяет функцию к страницам всех загруженных списков задач
+function patchTaskLists(queryClient: QueryClient, patch: (items: Task[]) => Task[]) {
+  queryClient.setQueriesData<TasksData>({ queryKey: ['tasks'] }, data =>
+    data && { ...data, pages: data.pages.map(page => ({ ...page, items: patch(page.items) })) }
+  )
+}
+
+function applyTaskUpdated(queryClient: QueryClient, id: number, changes: Partial<Task>) {
+  queryClient.setQueryData<Task>(['task', id], task => task && { ...task, ...changes })
+
+  // Изменение отфильтрованного поля может добавить задачу в список или убрать из него:
+  // такие списки перечитываем, остальные правим на месте
+  if (FILTERED_FIELDS.some(field => field in changes)) {
+    queryClient.invalidateQueries({
+      queryKey: ['tasks'],
+      predicate: query => hasFilters(query.queryKey[1] as TaskFilters | undefined),
+    })
+  }
+  patchTaskLists(queryClient, items => items.map(task => (task.id === id ? { ...task, ...changes } : task)))
+}
+
+// Подписка на поток изменений задач; вызывается один раз в корневом Layout
+export function useTaskEvents() {
+  const queryClient = useQueryClient()
+
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/tasks/events`)
+    let disconnected = false
+
+    source.addEventListener('task_created', () => {
+      // Позиция новой задачи зависит от фильтров и пагинации - проще перечитать списки
+      queryClient.invalidateQueries({ queryKey: ['tasks'] })
+    })
+    source.addEventListener('task_updated', event => {
+      const { id, changes } = JSON.parse((event as MessageEvent).data)
+      applyTaskUpdated(queryClient, id, changes)
+    })
+    source.addEventListener('task_deleted', event => {
+      const { id } = JSON.parse((event as MessageEvent).data)
+      queryClient.removeQueries({ queryKey: ['task', id] })
+      patchTaskLists(queryClient, items => items.filter(task => task.id !== id))
+    })
+    source.addEventListener('tasks_archived', event => {
+      // Архивные задачи пропадают из списков, но по-прежнему открываются по ID
+      const ids = new Set<number>(JSON.parse((event as MessageEvent).data).ids)
+      patchTaskLists(queryClient, items => items.filter(task => !ids.has(task.id)))
+    })
+    source.addEventListener('stats', event => {
+      const { stats } = JSON.parse((event as MessageEvent).data) as { stats: StatsData }
+      queryClient.setQueryData(['stats'], stats)
+    })
+
+    source.onerror = () => {
+      disconnected = true
+    }
+    source.onopen = () => {
+      // После обрыва часть событий могла потеряться: перечитываем все, что обновляет поток
+      if (disconnected) {
+        disconnected = false
+        queryClient.invalidateQueries({ queryKey: ['tasks'] })
+        queryClient.invalidateQueries({ queryKey: ['task'] })
+        queryClient.invalidateQueries({ queryKey: ['stats'] })
+      }
+    }
+
+    return () => source.close()
+  }, [queryClient])
+}
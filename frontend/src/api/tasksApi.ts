@@ -21,9 +21,39 @@ export interface Task {
 // Тип данных для обновления задачи (все поля опциональны)
 export type TaskUpdatePayload = Partial<Omit<Task, 'id' | 'points'> & { status?: string }>;
 
-// Получение списка всех задач
-export const fetchTasks = async (): Promise<Task[]> => {
-  const response = await axios.get(`${API_URL}/tasks/`)
+// Фильтры списка задач (применяются на сервере)
+export interface TaskFilters {
+  status?: string
+  assignee?: string
+  branch?: string
+  reviewer?: string
+  watcher?: string
+  // Задачи, где пользователь - участник (в роли role, если задана)
+  member?: string
+  role?: 'reviewer' | 'watcher'
+}
+
+// Страница списка задач; next_cursor === null, если страниц больше нет
+export interface TaskPage {
+  items: Task[]
+  next_cursor: number | null
+}
+
+export const TASKS_PAGE_SIZE = 50
+
+// Получение одной страницы задач (keyset-пагинация по id)
+export const fetchTasks = async (
+  filters: TaskFilters = {},
+  cursor: number | null = null,
+  limit: number = TASKS_PAGE_SIZE,
+): Promise<TaskPage> => {
+  // Пустые фильтры не отправляем, чтобы не фильтровать по пустой строке
+  const params: Record<string, string | number> = { limit }
+  for (const [key, value] of Object.entries(filters)) {
+    if (value) params[key] = value
+  }
+  if (cursor !== null) params.cursor = cursor
+  const response = await axios.get(`${API_URL}/tasks/`, { params })
   return response.data
 }
 
@@ -57,7 +87,8 @@ export const fetchStats = async (): Promise<StatsData> => {
 };
 
 // Функция для загрузки файла
-export const uploadFile = async (file: File): Promise<{ url: string }> => {
+// url - оригинал (имя = SHA-256 содержимого), thumbnail_url - уменьшенная копия (только для изображений)
+export const uploadFile = async (file: File): Promise<{ url: string; thumbnail_url: string | null }> => {
     const formData = new FormData();
     formData.append("file", file);
 
@@ -69,6 +100,13 @@ export const uploadFile = async (file: File): Promise<{ url: string }> => {
     return response.data;
 };
 
+// URL миниатюры для загруженного изображения. Миниатюры есть только у файлов,
+// сохраненных по хешу содержимого; для остальных возвращается исходный URL
+export const thumbnailUrl = (url: string): string => {
+  const match = url.match(/^(.*\/uploads\/)([0-9a-f]{64})(\.[a-z0-9]+)?$/)
+  return match ? `${match[1]}thumbs/${match[2]}.webp` : url
+}
+
 // Новая функция для назначения ответственного за ветку
 export const assignBranchResponsible = async (taskId: number, githubLogin: string): Promise<Task> => {
   const response = await axios.patch(`${API_URL}/tasks/${taskId}/assign_branch`, {
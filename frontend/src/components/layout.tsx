@@ -1,6 +1,7 @@
 import { Outlet, Link } from '@tanstack/react-router'
 import { useQuery } from '@tanstack/react-query'
 import { fetchCurrentUser, logout } from '../api/authApi'
+import { useTaskEvents } from '../api/taskEvents'
 
 // Вспомогательная функция для SVG иконок (упрощение)
 const SvgIcon = ({ d, className = "bi", size = 16 }: { d: string, className?: string, size?: number }) => (
@@ -10,6 +11,9 @@ const SvgIcon = ({ d, className = "bi", size = 16 }: { d: string, className?: st
 );
 
 export function Layout() {
+  // Живые обновления задач и статистики для всех страниц
+  useTaskEvents()
+
   const { data: user, isLoading, isError } = useQuery({
     queryKey: ['currentUser'],
     queryFn: fetchCurrentUser,
@@ -1,4 +1,5 @@
 import { useQuery } from '@tanstack/react-query'
+import { LIVE_STALE_TIME } from '../api/taskEvents'
 import { Card, ProgressBar, Spinner, Alert, ListGroup, Badge } from 'react-bootstrap'
 
 interface StatsData {
@@ -38,7 +39,8 @@ export function StatsDashboard() {
   const { data: stats, isLoading, isError } = useQuery({
     queryKey: ['stats'],
     queryFn: fetchStats,
-    refetchInterval: 60000, // Обновление каждую минуту
+    // Вместо опроса раз в минуту статистику присылает поток /tasks/events
+    staleTime: LIVE_STALE_TIME,
   })
 
   // Состояние загрузки
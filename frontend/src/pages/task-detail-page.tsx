@@ -1,6 +1,7 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { Link, useParams } from '@tanstack/react-router';
-import { fetchTaskById, assignBranchResponsible, API_URL } from '../api/tasksApi';
+import { fetchTaskById, assignBranchResponsible, API_URL, thumbnailUrl } from '../api/tasksApi';
+import { LIVE_STALE_TIME } from '../api/taskEvents';
 import ReactMarkdown from 'react-markdown';
 import { Container, Spinner, Alert, Card, Badge, Row, Col, Image, ListGroup, Button, Form, InputGroup } from 'react-bootstrap';
 import { useState, useEffect } from 'react';
@@ -30,6 +31,7 @@ export function TaskDetailPage() {
     queryKey: ['task', taskIdNumber],
     queryFn: () => fetchTaskById(taskIdNumber),
     enabled: !isNaN(taskIdNumber),
+    staleTime: LIVE_STALE_TIME,
   });
 
   // Используем useEffect для установки начального значения ПОСЛЕ успешной загрузки
@@ -134,9 +136,14 @@ export function TaskDetailPage() {
                   {task.image_urls.map(url => {
                     // Формируем полный URL, если url - относительный путь
                     const fullUrl = url.startsWith('http') ? url : `${API_URL}${url}`;
+                    // В карточке показываем миниатюру; если ее нет - оригинал
                     return (
                       <a key={url} href={fullUrl} target="_blank" rel="noopener noreferrer">
-                        <Image src={fullUrl} thumbnail width={100} height={100} style={{ objectFit: 'cover' }} alt="Изображение"/>
+                        <Image
+                          src={thumbnailUrl(fullUrl)}
+                          onError={(e) => { if (e.currentTarget.src !== fullUrl) e.currentTarget.src = fullUrl }}
+                          thumbnail width={100} height={100} style={{ objectFit: 'cover' }} alt="Изображение"
+                        />
                       </a>
                     )
                   })}
@@ -1,8 +1,10 @@
-import { useQuery } from '@tanstack/react-query'
-import { fetchTasks, Task } from '../api/tasksApi'
+import { useState } from 'react'
+import { useInfiniteQuery, keepPreviousData } from '@tanstack/react-query'
+import { LIVE_STALE_TIME } from '../api/taskEvents'
+import { fetchTasks, TaskFilters } from '../api/tasksApi'
 import { StatsDashboard } from '../components/stats-dashboard'
 import { Link } from '@tanstack/react-router'
-import { Container, Spinner, Alert, Button, Badge, Table } from 'react-bootstrap'
+import { Container, Spinner, Alert, Button, Badge, Table, Form } from 'react-bootstrap'
 
 // Маппинг статусов можно оставить для бейджей в таблице
 const statusMap: Record<string, { label: string; bg: string; icon: string }> = {
@@ -24,12 +26,57 @@ function TaskStatusBadge({ status }: { status: string }) {
    );
 }
 
+// Панель фильтров списка задач
+function TaskFiltersBar({ filters, onChange }: { filters: TaskFilters, onChange: (filters: TaskFilters) => void }) {
+  return (
+    <Form className="d-flex gap-2 mb-3" onSubmit={(e) => e.preventDefault()}>
+      <Form.Select
+        size="sm"
+        style={{ maxWidth: '200px' }}
+        value={filters.status ?? ''}
+        onChange={(e) => onChange({ ...filters, status: e.target.value || undefined })}
+      >
+        <option value="">Все статусы</option>
+        {Object.entries(statusMap).map(([status, info]) => (
+          <option key={status} value={status}>{info.label}</option>
+        ))}
+      </Form.Select>
+      <Form.Control
+        size="sm"
+        style={{ maxWidth: '200px' }}
+        placeholder="Исполнитель"
+        value={filters.assignee ?? ''}
+        onChange={(e) => onChange({ ...filters, assignee: e.target.value || undefined })}
+      />
+    </Form>
+  )
+}
+
 export function TasksPage() {
-  const { data: tasks, isLoading, isError, error } = useQuery<Task[]>({
-    queryKey: ['tasks'],
-    queryFn: fetchTasks,
+  const [filters, setFilters] = useState<TaskFilters>({})
+
+  const {
+    data,
+    isLoading,
+    isError,
+    error,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['tasks', filters],
+    queryFn: ({ pageParam }) => fetchTasks(filters, pageParam),
+    initialPageParam: null as number | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor,
+    // При смене фильтров показываем прежний список, пока грузится новый
+    placeholderData: keepPreviousData,
+    // Актуальность поддерживает поток /tasks/events (useTaskEvents)
+    staleTime: LIVE_STALE_TIME,
   })
 
+  const tasks = data?.pages.flatMap(page => page.items)
+  const hasFilters = Object.values(filters).some(Boolean)
+
   // Состояние загрузки
   if (isLoading) {
     return (
@@ -63,8 +110,8 @@ export function TasksPage() {
     )
   }
 
-  // Состояние, когда задач нет
-  if (!tasks || tasks.length === 0) {
+  // Состояние, когда задач нет (и фильтры не заданы)
+  if ((!tasks || tasks.length === 0) && !hasFilters) {
     return (
       <Container className="py-4">
         <StatsDashboard />
@@ -103,6 +150,8 @@ export function TasksPage() {
         </Button>
       </div>
       
+      <TaskFiltersBar filters={filters} onChange={setFilters} />
+
       {/* Таблица задач */} 
       <Table striped bordered hover responsive size="sm" className="align-middle mt-3"> {/* Добавляем size="sm" и отступ */} 
          <thead className="table-light">
@@ -116,7 +165,7 @@ export function TasksPage() {
            </tr>
          </thead>
          <tbody>
-           {tasks.map(task => (
+           {tasks?.map(task => (
              <tr key={task.id}>
                <td>
                  <Link 
@@ -143,6 +192,20 @@ export function TasksPage() {
            ))}
          </tbody>
        </Table>
+
+       {/* Подгрузка следующей страницы */}
+       {hasNextPage && (
+         <div className="text-center">
+           <Button
+             variant="outline-primary"
+             size="sm"
+             onClick={() => fetchNextPage()}
+             disabled={isFetchingNextPage}
+           >
+             {isFetchingNextPage ? <Spinner animation="border" size="sm" /> : 'Загрузить ещё'}
+           </Button>
+         </div>
+       )}
     </Container>
   )
 } 
\ No newline at end of file